@@ -1,16 +1,19 @@
+from contextlib import contextmanager
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, create_engine
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, Float, ForeignKey, Index, Text, UniqueConstraint, create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.schema import CreateIndex, CreateTable
 
-from app.config import DATABASE_URL
+from app.config import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, SQLITE_JOURNAL_MODE, SQLITE_BUSY_TIMEOUT
 
 Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
     
-    chat_id = Column(Integer, primary_key=True)
+    # Telegram user and group IDs do not fit in 32 bits
+    chat_id = Column(BigInteger, primary_key=True, autoincrement=False)
     name = Column(String(100), nullable=False)
     first_use_date = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=False)
@@ -26,26 +29,147 @@ class Message(Base):
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     message_id = Column(Integer, nullable=False)
-    chat_id = Column(Integer, ForeignKey("users.chat_id"), nullable=False)
+    chat_id = Column(BigInteger, ForeignKey("users.chat_id"), nullable=False)
     message = Column(Text, nullable=False)
     message_date = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="messages")
     
+    __table_args__ = (Index("ix_messages_chat_id_message_date", "chat_id", "message_date"),)
+    
     def __repr__(self):
         return f"<Message {self.id} from user {self.chat_id}>"
 
-# Create the engine and tables
-engine = create_engine(DATABASE_URL)
-Base.metadata.create_all(engine)
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    chat_id = Column(BigInteger, nullable=False)
+    video_id = Column(String(20), nullable=False)
+    language = Column(String(10), default="en")
+    # queued, transcript, summary, sending, done or failed
+    state = Column(String(20), nullable=False, default="queued")
+    progress_message_id = Column(Integer)
+    stream_message_id = Column(Integer)
+    result = Column(Text)
+    error = Column(Text)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (Index("ix_jobs_state_created_at", "state", "created_at"),)
+    
+    def __repr__(self):
+        return f"<Job {self.id} {self.video_id} ({self.state})>"
 
-# Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+class SummaryCacheEntry(Base):
+    __tablename__ = "summary_cache"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    prompt_hash = Column(String(64), nullable=False)
+    model = Column(String(100), nullable=False)
+    video_id = Column(String(20), index=True)
+    transcript_hash = Column(String(64), nullable=False)
+    template_hash = Column(String(64), nullable=False, index=True)
+    summary = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (UniqueConstraint("prompt_hash", "model"),)
+    
+    def __repr__(self):
+        return f"<SummaryCacheEntry {self.video_id} ({self.model})>"
 
+class TranscriptCacheEntry(Base):
+    __tablename__ = "transcript_cache"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_id = Column(String(20), nullable=False, index=True)
+    language = Column(String(10), nullable=False)
+    content = Column(Text, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed = Column(DateTime, default=datetime.utcnow, index=True)
+    
+    __table_args__ = (UniqueConstraint("video_id", "language"),)
+    
+    def __repr__(self):
+        return f"<TranscriptCacheEntry {self.video_id} ({self.language})>"
+
+class ProxyRecord(Base):
+    __tablename__ = "proxies"
+    
+    address = Column(String(255), primary_key=True)
+    successes = Column(Integer, default=0)
+    failures = Column(Integer, default=0)
+    latency = Column(Float)
+    last_checked = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<ProxyRecord {self.address}>"
+
+def _create_engine(url):
+    """Create a pooled engine; SQLite gets WAL journaling and tuned pragmas"""
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_pre_ping=True
+        )
+    
+    sqlite_engine = create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT / 1000}
+    )
+    
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        # With WAL, NORMAL only syncs at checkpoints and stays corruption-safe
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute("PRAGMA cache_size=-16000")  # 16 MB page cache
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+    
+    return sqlite_engine
+
+# Create the engine; the tables are created by init_db()
+engine = _create_engine(DATABASE_URL)
+
+# Create session factory; objects stay usable after commit and close
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+def init_db():
+    """Create the tables and indexes that do not exist yet
+
+    Called once at startup by every process, rather than on import. Each
+    statement is IF NOT EXISTS, so processes starting together against one
+    database do not trip over each other, and indexes added to existing
+    tables later are created too.
+    """
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            connection.execute(CreateTable(table, if_not_exists=True))
+            for index in table.indexes:
+                connection.execute(CreateIndex(index, if_not_exists=True))
+
+@contextmanager
 def get_db():
-    """Get database session"""
+    """Provide a database session for one unit of work
+
+    Usage: with get_db() as db: ...
+    The session is rolled back if the block raises and always closed,
+    returning its connection to the pool.
+    """
     db = SessionLocal()
     try:
-        return db
+        yield db
+    except Exception:
+        db.rollback()
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,6 +1,7 @@
 from datetime import datetime
-from sqlalchemy.orm import Session
-from app.database.models import User, Message, get_db
+from sqlalchemy import and_, exists, func, insert, or_, select, update
+from sqlalchemy.orm import Session, aliased
+from app.database.models import Job, User, Message, ProxyRecord, SummaryCacheEntry, TranscriptCacheEntry
 
 class UserRepository:
     @staticmethod
@@ -20,7 +21,6 @@ class UserRepository:
         )
         db.add(user)
         db.commit()
-        db.refresh(user)
         return user
     
     @staticmethod
@@ -30,7 +30,6 @@ class UserRepository:
         if user:
             user.is_active = is_active
             db.commit()
-            db.refresh(user)
             return user
         return None
     
@@ -41,7 +40,6 @@ class UserRepository:
         if user:
             user.language = language
             db.commit()
-            db.refresh(user)
             return user
         return None
 
@@ -57,12 +55,266 @@ class MessageRepository:
         )
         db.add(message_obj)
         db.commit()
-        db.refresh(message_obj)
         return message_obj
     
+    @staticmethod
+    def create_messages(db: Session, rows: list):
+        """Insert many message records in one batch
+
+        rows are dicts with message_id, chat_id, message and message_date.
+        """
+        if rows:
+            db.execute(insert(Message), rows)
+            db.commit()
+        return len(rows)
+    
     @staticmethod
     def get_user_messages(db: Session, chat_id: int, limit: int = 10):
         """Get recent messages for a user"""
         return db.query(Message).filter(
             Message.chat_id == chat_id
-        ).order_by(Message.message_date.desc()).limit(limit).all()
\ No newline at end of file
+        ).order_by(Message.message_date.desc()).limit(limit).all()
+
+class JobRepository:
+    # States of jobs that have not finished yet
+    OPEN_STATES = ("queued", "transcript", "summary", "sending")
+    # States of jobs that are being worked on
+    RUNNING_STATES = ("transcript", "summary", "sending")
+    
+    @staticmethod
+    def create_job(db: Session, chat_id: int, video_id: str, language: str, progress_message_id: int = None):
+        """Record a new note job"""
+        now = datetime.utcnow()
+        job = Job(
+            chat_id=chat_id,
+            video_id=video_id,
+            language=language,
+            state="queued",
+            progress_message_id=progress_message_id,
+            attempts=1,
+            created_at=now,
+            updated_at=now
+        )
+        db.add(job)
+        db.commit()
+        return job
+    
+    @staticmethod
+    def get_job(db: Session, job_id: int):
+        """Get a job by ID"""
+        return db.query(Job).filter(Job.id == job_id).first()
+    
+    @staticmethod
+    def update_job(db: Session, job_id: int, **fields):
+        """Set job columns, such as state, result or message IDs"""
+        fields["updated_at"] = datetime.utcnow()
+        db.query(Job).filter(Job.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+    
+    @staticmethod
+    def get_open_jobs(db: Session):
+        """Get unfinished jobs, oldest first"""
+        return db.query(Job).filter(
+            Job.state.in_(JobRepository.OPEN_STATES)
+        ).order_by(Job.created_at.asc()).all()
+    
+    @staticmethod
+    def count_open_jobs(db: Session, chat_id: int):
+        """Count a chat's unfinished jobs"""
+        return db.query(func.count(Job.id)).filter(
+            Job.chat_id == chat_id,
+            Job.state.in_(JobRepository.OPEN_STATES)
+        ).scalar()
+    
+    @staticmethod
+    def claim_job(db: Session, lease_expired_before: datetime):
+        """
+        Atomically claim the oldest queued job that may start, for a worker.
+        A job waits while its chat has a running job, so notes reach a chat
+        in request order, and while the same video is being worked on, so it
+        finds the notes in the shared caches. Running jobs whose worker has
+        not reported since lease_expired_before are requeued first, counting
+        one more attempt. Return the claimed job or None.
+        """
+        now = datetime.utcnow()
+        db.execute(
+            update(Job).where(
+                Job.state.in_(JobRepository.RUNNING_STATES),
+                Job.updated_at < lease_expired_before
+            ).values(state="queued", attempts=Job.attempts + 1)
+        )
+        
+        queued, running, earlier = aliased(Job), aliased(Job), aliased(Job)
+        next_job = select(queued.id).where(
+            queued.state == "queued",
+            ~exists().where(
+                running.state.in_(JobRepository.RUNNING_STATES),
+                or_(
+                    running.chat_id == queued.chat_id,
+                    and_(running.video_id == queued.video_id, running.language == queued.language)
+                )
+            ),
+            ~exists().where(
+                earlier.state == "queued",
+                earlier.chat_id == queued.chat_id,
+                earlier.id < queued.id
+            )
+        ).order_by(queued.id).limit(1).scalar_subquery()
+        
+        # One UPDATE takes SQLite's write lock before it reads, so two workers never claim the same job
+        job_id = db.execute(
+            update(Job).where(Job.id == next_job, Job.state == "queued")
+            .values(state="transcript", updated_at=now)
+            .returning(Job.id)
+        ).scalar()
+        db.commit()
+        return JobRepository.get_job(db, job_id) if job_id else None
+    
+    @staticmethod
+    def touch_jobs(db: Session, job_ids: list):
+        """Renew the lease of running jobs"""
+        db.query(Job).filter(
+            Job.id.in_(job_ids),
+            Job.state.in_(JobRepository.RUNNING_STATES)
+        ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+    
+    @staticmethod
+    def requeue_jobs(db: Session, job_ids: list):
+        """Put running jobs back in the queue, for another worker to take"""
+        requeued = db.query(Job).filter(
+            Job.id.in_(job_ids),
+            Job.state.in_(JobRepository.RUNNING_STATES)
+        ).update({"state": "queued", "updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        return requeued
+    
+    @staticmethod
+    def delete_finished_jobs(db: Session, finished_before: datetime):
+        """Delete done and failed jobs last updated before the given time"""
+        deleted = db.query(Job).filter(
+            ~Job.state.in_(JobRepository.OPEN_STATES),
+            Job.updated_at < finished_before
+        ).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+class SummaryCacheRepository:
+    @staticmethod
+    def get_entry(db: Session, prompt_hash: str, models: list):
+        """Get a cached summary by prompt hash made by any of the models"""
+        return db.query(SummaryCacheEntry).filter(
+            SummaryCacheEntry.prompt_hash == prompt_hash,
+            SummaryCacheEntry.model.in_(models)
+        ).first()
+    
+    @staticmethod
+    def save_entry(db: Session, prompt_hash: str, model: str, video_id: str,
+                   transcript_hash: str, template_hash: str, summary: str):
+        """Insert or replace a cached summary"""
+        entry = SummaryCacheRepository.get_entry(db, prompt_hash, [model])
+        if not entry:
+            entry = SummaryCacheEntry(prompt_hash=prompt_hash, model=model)
+            db.add(entry)
+        entry.video_id = video_id
+        entry.transcript_hash = transcript_hash
+        entry.template_hash = template_hash
+        entry.summary = summary
+        entry.created_at = datetime.utcnow()
+        db.commit()
+        return entry
+    
+    @staticmethod
+    def delete_entries(db: Session, video_id: str = None, exclude_template_hashes: list = None):
+        """Delete cached summaries, optionally for one video or all but the given templates"""
+        query = db.query(SummaryCacheEntry)
+        if video_id:
+            query = query.filter(SummaryCacheEntry.video_id == video_id)
+        if exclude_template_hashes:
+            query = query.filter(SummaryCacheEntry.template_hash.notin_(exclude_template_hashes))
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+class TranscriptCacheRepository:
+    @staticmethod
+    def get_entry(db: Session, video_id: str, language: str = None):
+        """Get a cached transcript, optionally restricted to a language"""
+        query = db.query(TranscriptCacheEntry).filter(TranscriptCacheEntry.video_id == video_id)
+        if language:
+            query = query.filter(TranscriptCacheEntry.language == language)
+        return query.order_by(TranscriptCacheEntry.created_at.desc()).first()
+    
+    @staticmethod
+    def touch_entry(db: Session, entry: TranscriptCacheEntry):
+        """Mark a cache entry as recently used"""
+        entry.last_accessed = datetime.utcnow()
+        db.commit()
+    
+    @staticmethod
+    def save_entry(db: Session, video_id: str, language: str, content: str):
+        """Insert or replace the cached transcript for a video and language"""
+        now = datetime.utcnow()
+        entry = db.query(TranscriptCacheEntry).filter(
+            TranscriptCacheEntry.video_id == video_id,
+            TranscriptCacheEntry.language == language
+        ).first()
+        if not entry:
+            entry = TranscriptCacheEntry(video_id=video_id, language=language)
+            db.add(entry)
+        entry.content = content
+        entry.size = len(content.encode("utf-8"))
+        entry.created_at = now
+        entry.last_accessed = now
+        db.commit()
+        return entry
+    
+    @staticmethod
+    def delete_entry(db: Session, entry: TranscriptCacheEntry):
+        """Delete a single cache entry"""
+        db.delete(entry)
+        db.commit()
+    
+    @staticmethod
+    def evict(db: Session, expires_before: datetime, max_entries: int, max_bytes: int):
+        """Delete expired entries, then least recently used ones until within limits"""
+        evicted = db.query(TranscriptCacheEntry).filter(
+            TranscriptCacheEntry.created_at < expires_before
+        ).delete(synchronize_session=False)
+        
+        count, total_size = db.query(
+            func.count(TranscriptCacheEntry.id),
+            func.coalesce(func.sum(TranscriptCacheEntry.size), 0)
+        ).one()
+        
+        if count > max_entries or total_size > max_bytes:
+            oldest = db.query(
+                TranscriptCacheEntry.id, TranscriptCacheEntry.size
+            ).order_by(TranscriptCacheEntry.last_accessed.asc())
+            stale_ids = []
+            for entry_id, size in oldest:
+                if count <= max_entries and total_size <= max_bytes:
+                    break
+                stale_ids.append(entry_id)
+                count -= 1
+                total_size -= size
+            db.query(TranscriptCacheEntry).filter(
+                TranscriptCacheEntry.id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+            evicted += len(stale_ids)
+        
+        db.commit()
+        return evicted
+
+class ProxyRepository:
+    @staticmethod
+    def get_proxies(db: Session):
+        """Get all stored proxies"""
+        return db.query(ProxyRecord).all()
+    
+    @staticmethod
+    def replace_proxies(db: Session, records: list):
+        """Replace the stored proxy scores with the given records"""
+        db.query(ProxyRecord).delete(synchronize_session=False)
+        db.add_all(records)
+        db.commit()
@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonically increasing value per label set"""
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels):
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def items(self):
+        """Return [(labels dict, value)]"""
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+    def render(self):
+        with self._lock:
+            return [
+                f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+                for key, value in sorted(self._values.items())
+            ]
+
+
+class Histogram:
+    """Bucketed distribution of observed values per label set"""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self):
+        """Return [(labels dict, count, mean, approximate p95)]"""
+        result = []
+        with self._lock:
+            for key, (counts, count, total) in self._series.items():
+                p95 = None
+                threshold = count * 0.95
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    if cumulative >= threshold:
+                        p95 = bound
+                        break
+                result.append((dict(zip(self.labelnames, key)), count, total / count, p95))
+        return result
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for key, (counts, count, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text format"""
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "notetaker_stage_duration_seconds", "Duration of pipeline stages", ("stage",)
+)
+TRANSCRIPT_FETCHES = registry.counter(
+    "notetaker_transcript_fetches_total", "Transcript fetch attempts by method and proxy round",
+    ("method", "proxy_round", "outcome")
+)
+TRANSCRIPT_CHARS = registry.histogram(
+    "notetaker_transcript_chars", "Transcript size in characters", (),
+    buckets=(1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000)
+)
+TRANSCRIPT_TOKENS = registry.histogram(
+    "notetaker_transcript_tokens", "Transcript size in tokens, as fetched (raw) and as sent to the LLM (sent)",
+    ("kind",), buckets=(250, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+)
+TRANSCRIPT_TOKENS_SAVED = registry.counter(
+    "notetaker_transcript_tokens_saved_total",
+    "Transcript tokens removed before the LLM call, by compaction or by the token budget", ("reason",)
+)
+LLM_LATENCY = registry.histogram(
+    "notetaker_llm_request_duration_seconds", "LLM request latency", ("model",)
+)
+LLM_REQUESTS = registry.counter(
+    "notetaker_llm_requests_total", "LLM provider attempts by outcome (success, error, timeout, hedge, cancelled)",
+    ("provider", "outcome")
+)
+LLM_TOKENS = registry.counter(
+    "notetaker_llm_tokens_total", "LLM tokens by model and kind", ("model", "kind")
+)
+CACHE_REQUESTS = registry.counter(
+    "notetaker_cache_requests_total", "Cache lookups by cache and result", ("cache", "result")
+)
+CACHE_EVICTIONS = registry.counter(
+    "notetaker_cache_evictions_total", "Entries evicted from a cache", ("cache",)
+)
+TELEGRAM_REQUESTS = registry.counter(
+    "notetaker_telegram_requests_total", "Bot API calls by method and outcome", ("method", "outcome")
+)
+PROGRESS_EDITS_SKIPPED = registry.counter(
+    "notetaker_progress_edits_skipped_total", "Progress updates coalesced into a later edit or dropped"
+)
+JOBS = registry.counter(
+    "notetaker_jobs_total", "Note requests by outcome", ("outcome",)
+)
+
+
+def cache_hit_rate(cache):
+    """Return (hits, misses, hit rate) for a cache"""
+    hits = CACHE_REQUESTS.get(cache=cache, result="hit")
+    misses = CACHE_REQUESTS.get(cache=cache, result="miss")
+    total = hits + misses
+    return hits, misses, hits / total if total else 0.0
+
+
+def record_usage(model, usage):
+    """Record token counts from an LLM response's usage block"""
+    if not usage:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if value:
+            LLM_TOKENS.inc(value, model=model, kind=kind.split("_")[0])
+    # Prompt tokens served from (cached) or written to (cache_write) the provider's prompt cache
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    if cached:
+        LLM_TOKENS.inc(cached, model=model, kind="cached")
+    written = getattr(usage, "cache_creation_input_tokens", None)
+    if written:
+        LLM_TOKENS.inc(written, model=model, kind="cache_write")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are frequent; keep them out of the bot log
+        pass
+
+
+class MetricsServer:
+    """Serve /metrics over HTTP from a background thread"""
+    def __init__(self, host=METRICS_HOST, port=METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    def start(self):
+        if self._server is not None or not self.port:
+            return
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        except OSError as e:
+            logger.warning(f"Metrics server could not start: {str(e)}")
+            return
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics", daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+metrics_server = MetricsServer()
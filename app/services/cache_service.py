@@ -0,0 +1,260 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from app.config import (
+    TRANSCRIPT_CACHE_TTL, TRANSCRIPT_CACHE_MAX_ENTRIES, TRANSCRIPT_CACHE_MAX_BYTES,
+    USER_CACHE_TTL, USER_CACHE_INACTIVE_TTL, USER_CACHE_MAX_ENTRIES
+)
+from app.database.models import get_db
+from app.database.repository import SummaryCacheRepository, TranscriptCacheRepository, UserRepository
+from app.metrics import CACHE_REQUESTS, CACHE_EVICTIONS
+from app.services.executor import run_blocking
+from app.services.transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptCache:
+    """Persistent transcript cache keyed by video ID and transcript language"""
+    def __init__(self, ttl=TRANSCRIPT_CACHE_TTL, max_entries=TRANSCRIPT_CACHE_MAX_ENTRIES,
+                 max_bytes=TRANSCRIPT_CACHE_MAX_BYTES):
+        self.ttl = timedelta(seconds=ttl)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def get(self, video_id, language=None):
+        """
+        Return the cached Transcript, or None on a miss. A transcript in
+        another language is only a hit when the video is known to have no
+        transcript in the requested one; otherwise fetching may find it.
+        """
+        with get_db() as db:
+            entry = TranscriptCacheRepository.get_entry(db, video_id, language)
+            fallback = not entry and bool(language)
+            if fallback:
+                entry = TranscriptCacheRepository.get_entry(db, video_id)
+            if entry and entry.created_at < datetime.utcnow() - self.ttl:
+                TranscriptCacheRepository.delete_entry(db, entry)
+                entry = None
+            transcript = Transcript.loads(entry.content) if entry else None
+            if entry and transcript is None:
+                # Plain text cached before segments were kept: fetch again
+                TranscriptCacheRepository.delete_entry(db, entry)
+            if fallback and transcript is not None and (
+                    not transcript.available_languages or language in transcript.available_languages):
+                # The video has a transcript in this language, or its languages were not recorded
+                transcript = None
+            if transcript is None:
+                CACHE_REQUESTS.inc(cache="transcript", result="miss")
+                return None
+            TranscriptCacheRepository.touch_entry(db, entry)
+            CACHE_REQUESTS.inc(cache="transcript", result="hit")
+            return transcript
+
+    def put(self, video_id, transcript):
+        """Store a Transcript and evict entries beyond the TTL or size limits"""
+        with get_db() as db:
+            TranscriptCacheRepository.save_entry(db, video_id, transcript.language, transcript.dumps())
+            evicted = TranscriptCacheRepository.evict(
+                db,
+                datetime.utcnow() - self.ttl,
+                self.max_entries,
+                self.max_bytes
+            )
+            CACHE_EVICTIONS.inc(evicted, cache="transcript")
+
+    async def aget(self, video_id, language=None):
+        """Look up a transcript without blocking the event loop"""
+        try:
+            return await run_blocking("cache", self.get, video_id, language)
+        except Exception as e:
+            logger.warning(f"Transcript cache lookup failed: {str(e)}")
+            return None
+
+    async def aput(self, video_id, transcript):
+        """Store a transcript without blocking the event loop"""
+        try:
+            await run_blocking("cache", self.put, video_id, transcript)
+        except Exception as e:
+            logger.warning(f"Transcript cache store failed: {str(e)}")
+
+
+def content_hash(text):
+    """Return a stable SHA-256 hex digest of a string"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """Persistent LLM summary cache keyed by formatted prompt hash and model"""
+    def get(self, prompt_hash, models):
+        """Return a summary of the prompt cached for any of the models, or None on a miss"""
+        with get_db() as db:
+            entry = SummaryCacheRepository.get_entry(db, prompt_hash, models)
+            if not entry:
+                CACHE_REQUESTS.inc(cache="summary", result="miss")
+                return None
+            CACHE_REQUESTS.inc(cache="summary", result="hit")
+            return entry.summary
+
+    def put(self, prompt_hash, model, video_id, transcript_hash, template_hash, summary):
+        """Store a summary"""
+        with get_db() as db:
+            SummaryCacheRepository.save_entry(
+                db, prompt_hash, model, video_id, transcript_hash, template_hash, summary
+            )
+
+    def invalidate(self, video_id=None, keep_template_hashes=None):
+        """Delete cached summaries and return how many were removed"""
+        with get_db() as db:
+            return SummaryCacheRepository.delete_entries(db, video_id, keep_template_hashes)
+
+    async def aget(self, prompt_hash, models):
+        """Look up a summary without blocking the event loop"""
+        try:
+            return await run_blocking("cache", self.get, prompt_hash, models)
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {str(e)}")
+            return None
+
+    async def aput(self, prompt_hash, model, video_id, transcript_hash, template_hash, summary):
+        """Store a summary without blocking the event loop"""
+        try:
+            await run_blocking(
+                "cache", self.put,
+                prompt_hash, model, video_id, transcript_hash, template_hash, summary
+            )
+        except Exception as e:
+            logger.warning(f"Summary cache store failed: {str(e)}")
+
+
+class UserProfile:
+    """Snapshot of the user fields read on every update"""
+    __slots__ = ("chat_id", "name", "is_active", "language")
+
+    def __init__(self, chat_id, name, is_active, language):
+        self.chat_id = chat_id
+        self.name = name
+        self.is_active = is_active
+        self.language = language
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.chat_id, user.name, bool(user.is_active), user.language or "en")
+
+
+class UserCache:
+    """
+    Write-through in-memory LRU cache of user profiles in front of UserRepository.
+    Inactive profiles expire after inactive_ttl, so a user activated directly
+    in the database can use the bot shortly after.
+    """
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES, inactive_ttl=USER_CACHE_INACTIVE_TTL):
+        self.ttl = ttl
+        self.inactive_ttl = inactive_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # chat_id -> (profile, expires_at)
+        self._lock = threading.Lock()
+
+    def peek(self, chat_id):
+        """Return the cached profile without touching the database, or None"""
+        with self._lock:
+            item = self._entries.get(chat_id)
+            if item is None:
+                return None
+            profile, expires_at = item
+            if expires_at < time.monotonic():
+                del self._entries[chat_id]
+                return None
+            self._entries.move_to_end(chat_id)
+            return profile
+
+    def _store(self, profile):
+        with self._lock:
+            ttl = self.ttl if profile.is_active else self.inactive_ttl
+            self._entries[profile.chat_id] = (profile, time.monotonic() + ttl)
+            self._entries.move_to_end(profile.chat_id)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            CACHE_EVICTIONS.inc(evicted, cache="user")
+        return profile
+
+    def invalidate(self, chat_id=None):
+        """Drop one cached profile, or all of them"""
+        with self._lock:
+            if chat_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(chat_id, None)
+
+    def get(self, chat_id):
+        """Return the user's profile, loading it from the database on a miss; None if unknown"""
+        profile = self.peek(chat_id)
+        if profile is not None:
+            CACHE_REQUESTS.inc(cache="user", result="hit")
+            return profile
+        CACHE_REQUESTS.inc(cache="user", result="miss")
+        with get_db() as db:
+            user = UserRepository.get_user(db, chat_id)
+        return self._store(UserProfile.from_user(user)) if user else None
+
+    def get_or_create(self, chat_id, name, is_active=False):
+        """Return (profile, created), registering the user if they are unknown"""
+        profile = self.get(chat_id)
+        if profile is not None:
+            return profile, False
+        with get_db() as db:
+            user = UserRepository.get_user(db, chat_id)
+            created = user is None
+            if created:
+                user = UserRepository.create_user(db, chat_id, name, is_active=is_active)
+        return self._store(UserProfile.from_user(user)), created
+
+    def set_language(self, chat_id, language):
+        """Update the user's language in the database and the cache"""
+        self.invalidate(chat_id)
+        with get_db() as db:
+            user = UserRepository.update_user_language(db, chat_id, language)
+        return self._store(UserProfile.from_user(user)) if user else None
+
+    def set_active(self, chat_id, is_active):
+        """Update the user's active status in the database and the cache"""
+        self.invalidate(chat_id)
+        with get_db() as db:
+            user = UserRepository.update_user_active_status(db, chat_id, is_active)
+        return self._store(UserProfile.from_user(user)) if user else None
+
+    async def aget(self, chat_id):
+        """Return the user's profile; only a cache miss leaves the event loop"""
+        profile = self.peek(chat_id)
+        if profile is not None:
+            CACHE_REQUESTS.inc(cache="user", result="hit")
+            return profile
+        return await run_blocking("cache", self.get, chat_id)
+
+    async def aget_or_create(self, chat_id, name, is_active=False):
+        """Return (profile, created); only a cache miss leaves the event loop"""
+        profile = self.peek(chat_id)
+        if profile is not None:
+            CACHE_REQUESTS.inc(cache="user", result="hit")
+            return profile, False
+        return await run_blocking("cache", self.get_or_create, chat_id, name, is_active)
+
+    async def aset_language(self, chat_id, language):
+        """Update the user's language without blocking the event loop"""
+        return await run_blocking("cache", self.set_language, chat_id, language)
+
+    async def aset_active(self, chat_id, is_active):
+        """Update the user's active status without blocking the event loop"""
+        return await run_blocking("cache", self.set_active, chat_id, is_active)
+
+
+transcript_cache = TranscriptCache()
+summary_cache = SummaryCache()
+user_cache = UserCache()
@@ -0,0 +1,69 @@
+import re
+
+# Sentence-ending punctuation, including the Persian/Arabic question mark
+SENTENCE_END_PATTERN = re.compile(r'(?<=[.!?؟。])\s+')
+SENTENCE_END_CHARS = ('.', '!', '?', '؟', '。')
+
+
+def _split_long_line(line, max_chars):
+    """Split a single oversized line on sentence boundaries, then hard-wrap"""
+    pieces = []
+    current = ""
+    for sentence in SENTENCE_END_PATTERN.split(line):
+        while len(sentence) > max_chars:
+            # No sentence boundary close enough: cut on the last space
+            cut = sentence.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_transcript(transcript, max_chars):
+    """
+    Split a transcript into chunks of at most max_chars characters.
+    Chunks break between transcript lines (one line per caption segment),
+    preferring lines that end a sentence, and only split inside a line
+    when the line itself is too long.
+    """
+    lines = []
+    for line in transcript.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if len(line) > max_chars:
+            lines.extend(_split_long_line(line, max_chars))
+        else:
+            lines.append(line)
+
+    chunks = []
+    buffer = []
+    size = 0
+    for line in lines:
+        if buffer and size + len(line) + 1 > max_chars:
+            # Cut after the last sentence end in the second half of the buffer
+            cut = len(buffer)
+            for idx in range(len(buffer) - 1, len(buffer) // 2 - 1, -1):
+                if buffer[idx].endswith(SENTENCE_END_CHARS):
+                    cut = idx + 1
+                    break
+            chunks.append("\n".join(buffer[:cut]))
+            buffer = buffer[cut:]
+            size = sum(len(item) + 1 for item in buffer)
+            if buffer and size + len(line) + 1 > max_chars:
+                chunks.append("\n".join(buffer))
+                buffer = []
+                size = 0
+        buffer.append(line)
+        size += len(line) + 1
+    if buffer:
+        chunks.append("\n".join(buffer))
+    return chunks
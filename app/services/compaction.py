@@ -0,0 +1,119 @@
+import logging
+import re
+
+from app.config import CHUNKING_THRESHOLD_CHARS, TRANSCRIPT_COMPACTION, TRANSCRIPT_TOKEN_BUDGET
+from app.services.transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+# Non-speech caption markers: [Music], [Applause], (laughter), ♪ ... ♪, >> speaker changes
+MARKER_PATTERN = re.compile(
+    r'\[[^\[\]]{1,40}\]'
+    r'|\((?:music|applause|laughter|laughs|laughing|inaudible|silence|cheering|sighs)\)'
+    r'|[♪♫]+|>>',
+    re.IGNORECASE
+)
+
+# Hesitation fillers, with the punctuation that follows them
+FILLER_PATTERN = re.compile(r'\b(?:u+m+|u+h+m*|e+r+m+|h+m+|m+h+m+)\b[,.]?', re.IGNORECASE)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+WORD_STRIP_CHARS = ".,!?;:\"'()-—…؟،"
+
+# Longest caption overlap looked for between consecutive segments, in words
+MAX_OVERLAP_WORDS = 40
+
+
+def clean_text(text):
+    """Strip non-speech markers and fillers from a caption line and normalize its whitespace"""
+    text = MARKER_PATTERN.sub(" ", text)
+    text = FILLER_PATTERN.sub(" ", text)
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def _overlap(previous, words):
+    """Number of leading words that repeat the end of the previous segment"""
+    limit = min(len(previous), len(words), MAX_OVERLAP_WORDS)
+    for size in range(limit, 0, -1):
+        if previous[-size:] == words[:size]:
+            # A single shared word is usually a coincidence, unless it is the whole segment
+            if size > 1 or size == len(words):
+                return size
+            break
+    return 0
+
+
+def _key(word):
+    return word.strip(WORD_STRIP_CHARS).lower()
+
+
+def compact_transcript(transcript):
+    """
+    Return a copy of the transcript without non-speech markers or fillers.
+    Auto-generated captions also lose repeated segments and the words they
+    repeat from the previous segment when they roll over; manual captions
+    do not roll over, so their repetitions are real speech and are kept.
+    Timings of kept segments are unchanged.
+    """
+    compacted = Transcript(transcript.language, transcript.is_generated)
+    previous = []
+    for start, duration, text in transcript:
+        words = clean_text(text).split(" ")
+        if words == [""]:
+            continue
+        overlap = 0
+        if transcript.is_generated:
+            keys = [_key(word) for word in words]
+            overlap = _overlap(previous, keys)
+            previous = (previous + keys[overlap:])[-MAX_OVERLAP_WORDS:]
+        if overlap < len(words):
+            compacted.append(start, duration, " ".join(words[overlap:]))
+    return compacted
+
+
+def count_tokens(text, model=None):
+    """Count tokens with the model's tokenizer, or estimate them if it is unavailable"""
+    try:
+        # Imported here: litellm takes seconds to import (see llm_router.preload_litellm)
+        from litellm import token_counter
+        return token_counter(model=model or "", text=text)
+    except Exception as e:
+        logger.debug(f"Token counting failed for {model}: {str(e)}")
+        return len(text) // 4
+
+
+def fit_to_budget(transcript, budget, model=None, tokens=None):
+    """
+    Return (transcript, tokens) cut at a segment boundary so that its text
+    has at most budget tokens. tokens is the count of the full text, if known.
+    """
+    if tokens is None:
+        tokens = count_tokens(transcript.text, model)
+    if not budget or tokens <= budget:
+        return transcript, tokens
+    # Estimate the cut from the token density, then shrink until it fits
+    keep = len(transcript) * budget // tokens
+    while keep > 0:
+        fitted = transcript.slice(end=transcript.starts[keep] / 1000)
+        tokens = count_tokens(fitted.text, model)
+        if tokens <= budget:
+            return fitted, tokens
+        keep = min(keep - 1, int(keep * budget / tokens))
+    return transcript.slice(end=0), 0
+
+
+def prepare_transcript(transcript, model=None, budget=TRANSCRIPT_TOKEN_BUDGET, compaction=TRANSCRIPT_COMPACTION,
+                       chunking_threshold=CHUNKING_THRESHOLD_CHARS):
+    """
+    Compact the transcript and enforce the token budget (blocking, runs in
+    the worker pool). Return (transcript, raw tokens, compacted tokens, tokens
+    left after the budget). The budget only applies to transcripts short
+    enough for a single LLM call; longer ones are summarized in parts.
+    """
+    raw_tokens = count_tokens(transcript.text, model)
+    compacted = compact_transcript(transcript) if compaction else transcript
+    compacted_tokens = count_tokens(compacted.text, model) if compaction else raw_tokens
+    if len(compacted.text) > chunking_threshold:
+        budget = 0
+    fitted, tokens = fit_to_budget(compacted, budget, model, compacted_tokens)
+    return fitted, raw_tokens, compacted_tokens, tokens
@@ -0,0 +1,95 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import WORKER_THREADS, FETCH_CONCURRENCY, LLM_CONCURRENCY
+from app.services.scheduler import FairScheduler, current_owner
+
+# Maximum number of concurrent operations per pipeline stage
+STAGE_LIMITS = {
+    "fetch": FETCH_CONCURRENCY,
+    "llm": LLM_CONCURRENCY,
+}
+
+_executor = None
+_schedulers = {}
+
+
+def get_executor():
+    """Get the shared worker thread pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=WORKER_THREADS,
+            thread_name_prefix="worker"
+        )
+    return _executor
+
+
+def get_stage_scheduler(stage):
+    """Get the fair scheduler bounding concurrency for a pipeline stage"""
+    if stage not in _schedulers:
+        _schedulers[stage] = FairScheduler(STAGE_LIMITS.get(stage, WORKER_THREADS))
+    return _schedulers[stage]
+
+
+def stage_limit(stage):
+    """
+    Hold a slot of the stage for the current owner (see current_owner).
+    Free slots are handed out round-robin across owners.
+    """
+    return get_stage_scheduler(stage).slot(current_owner.get())
+
+
+async def run_blocking(stage, func, *args, **kwargs):
+    """Run a blocking function in the worker pool under the stage's concurrency limit"""
+    loop = asyncio.get_running_loop()
+    async with stage_limit(stage):
+        return await loop.run_in_executor(
+            get_executor(),
+            functools.partial(func, *args, **kwargs)
+        )
+
+
+async def run_blocking_with_timeout(stage, timeout, func, *args, **kwargs):
+    """
+    Like run_blocking, but raise asyncio.TimeoutError if func runs longer
+    than timeout seconds. The time spent waiting for a stage slot or a
+    worker thread does not count. A call that times out or is cancelled
+    cannot be interrupted, so it keeps its stage slot until its thread
+    finishes; the stage limit then bounds abandoned calls too.
+    """
+    loop = asyncio.get_running_loop()
+    scheduler = get_stage_scheduler(stage)
+    owner = current_owner.get()
+    await scheduler.acquire(owner)
+    running = asyncio.Event()
+
+    def call():
+        loop.call_soon_threadsafe(running.set)
+        return func(*args, **kwargs)
+
+    def release_later(_):
+        try:
+            loop.call_soon_threadsafe(scheduler.release, owner)
+        except RuntimeError:
+            pass  # The loop is closed
+
+    future = None
+    try:
+        future = get_executor().submit(call)
+        await running.wait()
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    finally:
+        if future is None or future.cancel() or future.done():
+            scheduler.release(owner)
+        else:
+            future.add_done_callback(release_later)
+
+
+def shutdown_executor(wait=True):
+    """Shut down the worker pool"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait)
+        _executor = None
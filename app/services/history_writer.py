@@ -0,0 +1,99 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from app.config import HISTORY_BATCH_SIZE, HISTORY_FLUSH_INTERVAL, HISTORY_QUEUE_SIZE
+from app.database.models import get_db
+from app.database.repository import MessageRepository
+from app.metrics import STAGE_DURATION
+from app.services.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Buffer message-history rows and insert them in batches from the background"""
+    def __init__(self, batch_size=HISTORY_BATCH_SIZE, flush_interval=HISTORY_FLUSH_INTERVAL,
+                 queue_size=HISTORY_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._task = None
+        self._pending = []  # rows taken off the queue but not yet flushed
+        self._flushing = None
+
+    def start(self):
+        """Start the background flush loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and write every buffered row"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushing is not None:
+            await self._flushing
+            self._flushing = None
+        rows, self._pending = self._pending, []
+        rows.extend(self._take(self._queue.qsize()))
+        for start in range(0, len(rows), self.batch_size):
+            await self._flush(rows[start:start + self.batch_size])
+
+    async def record(self, message_id, chat_id, message):
+        """Queue a message for the history; waits only when the buffer is full"""
+        self.start()
+        await self._queue.put({
+            "message_id": message_id,
+            "chat_id": chat_id,
+            "message": message,
+            "message_date": datetime.utcnow()
+        })
+
+    def _take(self, limit):
+        rows = []
+        while len(rows) < limit and not self._queue.empty():
+            rows.append(self._queue.get_nowait())
+        return rows
+
+    @staticmethod
+    def _insert(rows):
+        with get_db() as db:
+            MessageRepository.create_messages(db, rows)
+
+    async def _flush(self, rows):
+        if not rows:
+            return
+        try:
+            with STAGE_DURATION.time(stage="history_flush"):
+                await run_blocking("cache", self._insert, rows)
+        except Exception as e:
+            logger.error(f"Failed to store {len(rows)} history messages: {str(e)}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Wait for the first row, then collect until the batch fills or the interval ends
+            self._pending.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                self._pending.extend(self._take(self.batch_size - len(self._pending)))
+                remaining = deadline - loop.time()
+                if len(self._pending) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            rows, self._pending = self._pending, []
+            # Shield the insert so stop() can wait for it instead of abandoning it
+            self._flushing = asyncio.ensure_future(self._flush(rows))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+
+history_writer = HistoryWriter()
@@ -0,0 +1,120 @@
+import logging
+from datetime import datetime, timedelta
+
+from app.config import JOB_LEASE, JOB_MAX_ATTEMPTS, JOB_RESUME_MAX_AGE, JOB_RETENTION
+from app.database.models import get_db
+from app.database.repository import JobRepository
+from app.services.executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """
+    Durable record of note jobs and their stage, so unfinished ones survive
+    a restart. In a split deployment it is also the queue front processes
+    add jobs to and worker processes claim them from.
+    """
+    def __init__(self, max_attempts=JOB_MAX_ATTEMPTS, resume_max_age=JOB_RESUME_MAX_AGE,
+                 retention=JOB_RETENTION, lease=JOB_LEASE):
+        self.max_attempts = max_attempts
+        self.resume_max_age = timedelta(seconds=resume_max_age)
+        self.retention = timedelta(seconds=retention)
+        self.lease = timedelta(seconds=lease)
+
+    def create(self, chat_id, video_id, language, progress_message_id=None):
+        """Record a new job; return its ID"""
+        with get_db() as db:
+            return JobRepository.create_job(db, chat_id, video_id, language, progress_message_id).id
+
+    def update(self, job_id, **fields):
+        """Set the job's state, result or message IDs"""
+        with get_db() as db:
+            JobRepository.update_job(db, job_id, **fields)
+
+    def count_open(self, chat_id):
+        """Number of the chat's unfinished jobs"""
+        with get_db() as db:
+            return JobRepository.count_open_jobs(db, chat_id)
+
+    def claim(self):
+        """Claim the next job a worker may start, requeueing jobs whose worker was lost; return it or None"""
+        with get_db() as db:
+            return JobRepository.claim_job(db, datetime.utcnow() - self.lease)
+
+    def heartbeat(self, job_ids):
+        """Renew the lease of a worker's running jobs"""
+        with get_db() as db:
+            JobRepository.touch_jobs(db, job_ids)
+
+    def release(self, job_ids):
+        """Requeue a stopping worker's running jobs; return how many were requeued"""
+        with get_db() as db:
+            return JobRepository.requeue_jobs(db, job_ids)
+
+    def prune(self):
+        """Delete finished jobs older than the retention period"""
+        with get_db() as db:
+            return JobRepository.delete_finished_jobs(db, datetime.utcnow() - self.retention)
+
+    def take_unfinished(self):
+        """
+        Return (resumable, abandoned) unfinished jobs after a restart.
+        Resumable jobs count one more attempt; jobs that are too old or were
+        already tried max_attempts times are marked failed. Old finished
+        jobs are deleted.
+        """
+        now = datetime.utcnow()
+        resumable = []
+        abandoned = []
+        with get_db() as db:
+            JobRepository.delete_finished_jobs(db, now - self.retention)
+            for job in JobRepository.get_open_jobs(db):
+                if job.attempts >= self.max_attempts or job.created_at < now - self.resume_max_age:
+                    JobRepository.update_job(db, job.id, state="failed", error="abandoned after a restart")
+                    abandoned.append(job)
+                else:
+                    JobRepository.update_job(db, job.id, attempts=job.attempts + 1)
+                    resumable.append(job)
+        return resumable, abandoned
+
+    async def acreate(self, chat_id, video_id, language, progress_message_id=None):
+        """Record a new job without blocking the event loop; return None if it could not be stored"""
+        try:
+            return await run_blocking("db", self.create, chat_id, video_id, language, progress_message_id)
+        except Exception as e:
+            logger.warning(f"Job could not be recorded: {str(e)}")
+            return None
+
+    async def aupdate(self, job_id, **fields):
+        """Update a job without blocking the event loop"""
+        if job_id is None:
+            return
+        try:
+            await run_blocking("db", self.update, job_id, **fields)
+        except Exception as e:
+            logger.warning(f"Job {job_id} could not be updated: {str(e)}")
+
+    async def atake_unfinished(self):
+        """Take unfinished jobs without blocking the event loop"""
+        return await run_blocking("db", self.take_unfinished)
+
+    async def acount_open(self, chat_id):
+        """Count the chat's unfinished jobs without blocking the event loop"""
+        return await run_blocking("db", self.count_open, chat_id)
+
+    async def aclaim(self):
+        """Claim the next job without blocking the event loop"""
+        return await run_blocking("db", self.claim)
+
+    async def aheartbeat(self, job_ids):
+        """Renew leases without blocking the event loop"""
+        if not job_ids:
+            return
+        try:
+            await run_blocking("db", self.heartbeat, job_ids)
+        except Exception as e:
+            logger.warning(f"Job leases could not be renewed: {str(e)}")
+
+
+job_store = JobStore()
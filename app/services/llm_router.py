@@ -0,0 +1,241 @@
+import asyncio
+import importlib
+import logging
+import threading
+import time
+from collections import deque
+
+from app.config import (
+    OPENAI_API_KEY, ANTHROPIC_API_KEY, GEMINI_API_KEY, OPENAI_MODEL, ANTHROPIC_MODEL, GEMINI_MODEL,
+    OPENAI_API_BASE, ANTHROPIC_API_BASE, GEMINI_API_BASE, DEFAULT_LLM, LLM_FALLBACKS,
+    LLM_TIMEOUT, LLM_HEDGE_AFTER, LLM_PROMPT_CACHING
+)
+from app.metrics import LLM_LATENCY, LLM_REQUESTS, record_usage
+
+logger = logging.getLogger(__name__)
+
+# litellm.acompletion, imported on first use (see _acompletion)
+acompletion = None
+
+
+def _acompletion():
+    """Return litellm.acompletion, importing litellm the first time; it takes seconds"""
+    global acompletion
+    if acompletion is None:
+        from litellm import acompletion as litellm_acompletion
+        acompletion = litellm_acompletion
+    return acompletion
+
+
+def preload_litellm():
+    """Import litellm in a background thread, so the first LLM call does not wait for it"""
+    threading.Thread(target=importlib.import_module, args=("litellm",), name="litellm-preload", daemon=True).start()
+
+
+class LLMProvider:
+    """One LLM provider with rolling latency and error statistics"""
+    # Weight of the newest sample in the latency moving average
+    LATENCY_ALPHA = 0.3
+    # Latency assumed before the first successful request
+    PRIOR_LATENCY = 5.0
+
+    def __init__(self, name, model, api_key, api_base=None, window=20):
+        self.name = name
+        self.model = model
+        self.api_key = api_key
+        self.api_base = api_base
+        self.latency = None
+        self.outcomes = deque(maxlen=window)  # True for success, newest last
+
+    def record(self, success, latency=None):
+        """Record the outcome of a request to this provider"""
+        self.outcomes.append(success)
+        if success:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.LATENCY_ALPHA * (latency - self.latency)
+
+    @property
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def expected_latency(self):
+        """Lower is better: smoothed latency inflated by the recent error rate"""
+        latency = self.latency if self.latency is not None else self.PRIOR_LATENCY
+        return latency * (1 + 4 * self.error_rate)
+
+    @property
+    def cache_control(self):
+        """Whether the provider needs explicit prompt caching hints; others cache prefixes on their own"""
+        return "claude" in self.model or self.model.startswith("anthropic/")
+
+    def messages(self, prompt, system=None):
+        """Chat messages for a prompt, with the static system prefix first so it can be cached"""
+        if not system:
+            return [{"role": "user", "content": prompt}]
+        if self.cache_control and LLM_PROMPT_CACHING:
+            system = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+    def request_kwargs(self):
+        kwargs = {"model": self.model, "api_key": self.api_key, "num_retries": 0}
+        if self.api_base:
+            kwargs["api_base"] = self.api_base
+        return kwargs
+
+
+class LLMRouter:
+    """
+    Route completions across providers: try the healthiest provider first,
+    fail over to the next one on errors or timeouts, and optionally hedge a
+    slow request by sending a backup to the next provider.
+    """
+    def __init__(self, providers, timeout=LLM_TIMEOUT, hedge_after=LLM_HEDGE_AFTER):
+        self.providers = providers
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+
+    @classmethod
+    def from_config(cls):
+        """Build the router from DEFAULT_LLM, LLM_FALLBACKS and the provider settings"""
+        available = {
+            "OPENAI": (OPENAI_MODEL, OPENAI_API_KEY, OPENAI_API_BASE),
+            "ANTHROPIC": (ANTHROPIC_MODEL, ANTHROPIC_API_KEY, ANTHROPIC_API_BASE),
+            "GEMINI": (GEMINI_MODEL, GEMINI_API_KEY, GEMINI_API_BASE),
+        }
+        primary = DEFAULT_LLM.upper() if DEFAULT_LLM.upper() in available else "GEMINI"
+        providers = []
+        for name in [primary] + LLM_FALLBACKS:
+            if name not in available or any(p.name == name for p in providers):
+                continue
+            model, api_key, api_base = available[name]
+            if api_key:
+                providers.append(LLMProvider(name, model, api_key, api_base))
+        return cls(providers)
+
+    @property
+    def primary(self):
+        return self.providers[0] if self.providers else None
+
+    def models(self):
+        """Model names of every configured provider, in preference order"""
+        return [provider.model for provider in self.providers]
+
+    def ranked(self):
+        """Providers from best to worst; configured order breaks near-ties"""
+        return sorted(
+            self.providers,
+            key=lambda p: p.expected_latency * (1 + 0.25 * self.providers.index(p))
+        )
+
+    async def complete(self, prompt, on_partial=None, system=None):
+        """
+        Return (text, model) from the first provider that succeeds.
+        system is the static instruction prefix, sent as a cacheable system message.
+        With on_partial, the response is streamed; only the attempt that
+        produces output first reports partial text.
+        """
+        candidates = iter(self.ranked())
+        pending = {}
+        errors = []
+        streamer = [None]  # provider currently allowed to report partial text
+        hedged = False
+
+        def launch():
+            provider = next(candidates, None)
+            if provider is not None:
+                task = asyncio.create_task(self._attempt(provider, provider.messages(prompt, system), on_partial, streamer))
+                pending[task] = provider
+            return provider
+
+        if not launch():
+            raise Exception("No LLM provider is configured")
+        try:
+            while pending:
+                # Hedge once, while the only attempt has produced no output yet
+                hedge = self.hedge_after > 0 and not hedged and len(pending) == 1 and streamer[0] is None
+                done, _ = await asyncio.wait(
+                    pending,
+                    timeout=self.hedge_after if hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    backup = launch()
+                    if backup:
+                        LLM_REQUESTS.inc(provider=backup.name, outcome="hedge")
+                    continue
+                for task in done:
+                    provider = pending.pop(task)
+                    try:
+                        return task.result(), provider.model
+                    except Exception as e:
+                        errors.append(f"{provider.name}: {str(e) or type(e).__name__}")
+                        if streamer[0] is provider:
+                            streamer[0] = None
+                if not pending:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        raise Exception("All LLM providers failed: " + "; ".join(errors))
+
+    async def _attempt(self, provider, messages, on_partial, streamer):
+        started = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(
+                self._request(provider, messages, on_partial, streamer),
+                self.timeout
+            )
+        except asyncio.CancelledError:
+            # Lost a hedge race; says nothing about the provider's health
+            LLM_REQUESTS.inc(provider=provider.name, outcome="cancelled")
+            raise
+        except asyncio.TimeoutError:
+            provider.record(False)
+            LLM_REQUESTS.inc(provider=provider.name, outcome="timeout")
+            raise Exception(f"no response within {self.timeout:g}s")
+        except Exception as e:
+            provider.record(False)
+            LLM_REQUESTS.inc(provider=provider.name, outcome="error")
+            logger.warning(f"LLM provider {provider.name} failed: {str(e)}")
+            raise
+        elapsed = time.perf_counter() - started
+        provider.record(True, elapsed)
+        LLM_REQUESTS.inc(provider=provider.name, outcome="success")
+        LLM_LATENCY.observe(elapsed, model=provider.model)
+        return text
+
+    @staticmethod
+    async def _request(provider, messages, on_partial, streamer):
+        if on_partial is None:
+            response = await _acompletion()(messages=messages, **provider.request_kwargs())
+            record_usage(provider.model, getattr(response, "usage", None))
+            return response.choices[0].message.content
+
+        response = await _acompletion()(
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},
+            **provider.request_kwargs()
+        )
+        text = ""
+        async for chunk in response:
+            record_usage(provider.model, getattr(chunk, "usage", None))
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                text += delta
+                if streamer[0] is None:
+                    streamer[0] = provider
+                if streamer[0] is provider:
+                    await on_partial(text)
+        return text
+
+    def snapshot(self):
+        """Return [(name, model, expected latency, error rate)] in ranked order"""
+        return [
+            (p.name, p.model, p.expected_latency, p.error_rate)
+            for p in self.ranked()
+        ]
@@ -1,58 +1,136 @@
-import os
-from litellm import completion
-from app.config import OPENAI_API_KEY, ANTHROPIC_API_KEY, GEMINI_API_KEY, DEFAULT_LLM, DEFAULT_PROMPT_TEMPLATE
+import asyncio
+from app.config import (
+    DEFAULT_PROMPT_TEMPLATE, LLM_STREAMING, CHUNK_PROMPT_TEMPLATE, CHUNKING_THRESHOLD_CHARS,
+    CHUNK_SIZE_CHARS, CHUNK_CONCURRENCY, DIGEST_PROMPT_TEMPLATE
+)
+from app.services.cache_service import summary_cache, content_hash
+from app.services.chunking import split_transcript
+from app.services.executor import stage_limit
+from app.services.llm_router import LLMRouter
+
+# Templates whose output is stored in the summary cache
+CACHED_TEMPLATES = (DEFAULT_PROMPT_TEMPLATE, DIGEST_PROMPT_TEMPLATE)
+
+
+def split_prompt(template, **fields):
+    """
+    Fill in a prompt template and split it into (system, user): the static
+    instructions before the first placeholder, up to the last "---" line,
+    and the rest. system is None when the template starts with a placeholder.
+    """
+    full = template.format(**fields)
+    # Everything before the first field is identical in the template and the prompt
+    head = template.format(**{name: "\0" for name in fields}).split("\0", 1)[0]
+    separator = head.rfind("\n---")
+    cut = separator if separator != -1 else head.rfind("\n") + 1
+    user = full[cut + len("\n---"):] if separator != -1 else full[cut:]
+    return head[:cut].strip() or None, user.strip()
+
 
 class LLMService:
-    def __init__(self, model=None):
-        self.model = model or DEFAULT_LLM
-        self._setup_api_keys()
-    
-    def _setup_api_keys(self):
-        """Set up API keys based on the selected model"""
-        if self.model == "OPENAI":
-            os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
-            self.model_name = "gpt-4"
-        elif self.model == "ANTHROPIC":
-            os.environ["ANTHROPIC_API_KEY"] = ANTHROPIC_API_KEY
-            self.model_name = "claude-3-opus-20240229"
-        else:  # Default to GEMINI
-            os.environ["GEMINI_API_KEY"] = GEMINI_API_KEY
-            self.model_name = "gemini-pro"
-            self.model = "GEMINI"
-    
-    def process_transcript(self, transcript, custom_prompt=None):
-        """Process the transcript using an LLM and return the result"""
-        # Prepare the prompt
+    """Long-lived LLM client; requests are routed across the configured providers"""
+    def __init__(self, router=None):
+        self.router = router or LLMRouter.from_config()
+
+    async def process_transcript(self, transcript, custom_prompt=None, video_id=None, on_partial=None):
+        """
+        Process the transcript using an LLM and return the result.
+        If on_partial is given and streaming is enabled, it is awaited with
+        the text generated so far as the final note streams in.
+        """
+        # Prepare the prompt: cacheable instructions, then the transcript
         prompt = custom_prompt or DEFAULT_PROMPT_TEMPLATE
         formatted_prompt = prompt.format(transcript=transcript)
-        
+        system, user = split_prompt(prompt, transcript=transcript)
+
+        # Serve identical prompts for the same model from the cache
+        prompt_hash = content_hash(formatted_prompt)
+        cached = await summary_cache.aget(prompt_hash, self.router.models())
+        if cached is not None:
+            return cached
+
         try:
-            # Call the LLM based on the selected model
-            response = self._call_llm(formatted_prompt)
-            return response
+            if len(transcript) > CHUNKING_THRESHOLD_CHARS:
+                # Too long for a single call: summarize parts, then write the note
+                response, model = await self._map_reduce(transcript, prompt, on_partial)
+            else:
+                # Call the best available provider
+                response, model = await self._call_llm(user, on_partial, system)
         except Exception as e:
             raise Exception(f"LLM processing error: {str(e)}")
-    
-    def _call_llm(self, prompt):
-        """Call the LLM using litellm"""
+
+        await summary_cache.aput(
+            prompt_hash,
+            model,
+            video_id,
+            content_hash(transcript),
+            content_hash(prompt),
+            response
+        )
+        return response
+
+    async def create_digest(self, notes, on_partial=None):
+        """Combine the notes of several videos, in order, into one digest"""
+        fields = {
+            "count": len(notes),
+            "notes": "\n\n".join(f"Video {index}:\n{note}" for index, note in enumerate(notes, 1)),
+        }
+        formatted_prompt = DIGEST_PROMPT_TEMPLATE.format(**fields)
+        system, user = split_prompt(DIGEST_PROMPT_TEMPLATE, **fields)
+
+        prompt_hash = content_hash(formatted_prompt)
+        cached = await summary_cache.aget(prompt_hash, self.router.models())
+        if cached is not None:
+            return cached
+
         try:
-            if self.model == "OPENAI":
-                response = completion(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-            elif self.model == "ANTHROPIC":
-                response = completion(
-                    model="anthropic/claude-3-7-sonnet-20250219",
-                    messages=[{"role": "user", "content": prompt}]
-                )
-            else:  # GEMINI with API token only (no Vertex, no google.auth)
-                response = completion(
-                    model="gemini/gemini-2.0-flash",
-                    messages=[{"role": "user", "content": prompt}],
+            response, model = await self._call_llm(user, on_partial, system)
+        except Exception as e:
+            raise Exception(f"LLM processing error: {str(e)}")
+
+        await summary_cache.aput(
+            prompt_hash,
+            model,
+            None,
+            content_hash("\n\n".join(notes)),
+            content_hash(DIGEST_PROMPT_TEMPLATE),
+            response
+        )
+        return response
+
+    async def _map_reduce(self, transcript, prompt, on_partial=None):
+        """Condense transcript chunks in parallel, then build the note from the condensed parts"""
+        chunks = split_transcript(transcript, CHUNK_SIZE_CHARS)
+        semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+        async def summarize_chunk(index, chunk):
+            system, user = split_prompt(
+                CHUNK_PROMPT_TEMPLATE,
+                part=index + 1,
+                total=len(chunks),
+                transcript=chunk
+            )
+            async with semaphore:
+                text, _ = await self._call_llm(user, system=system)
+                return text
+
+        partial_notes = await asyncio.gather(
+            *(summarize_chunk(index, chunk) for index, chunk in enumerate(chunks))
+        )
+        system, user = split_prompt(prompt, transcript="\n\n".join(partial_notes))
+        return await self._call_llm(user, on_partial, system)
+
+    async def _call_llm(self, prompt, on_partial=None, system=None):
+        """Call the LLM through the router; return (text, model that wrote it)"""
+        try:
+            async with stage_limit("llm"):
+                return await self.router.complete(
+                    prompt,
+                    on_partial=on_partial if LLM_STREAMING else None,
+                    system=system
                 )
-            
-            # Extract and return the content
-            return response.choices[0].message.content
         except Exception as e:
-            raise Exception(f"LLM API error: {str(e)}")
\ No newline at end of file
+            raise Exception(f"LLM API error: {str(e)}")
+
+
+llm_service = LLMService()
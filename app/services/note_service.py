@@ -0,0 +1,81 @@
+import logging
+
+from app.metrics import STAGE_DURATION, TRANSCRIPT_CHARS, TRANSCRIPT_TOKENS, TRANSCRIPT_TOKENS_SAVED
+from app.services.compaction import prepare_transcript
+from app.services.executor import run_blocking
+from app.services.youtube_service import YouTubeService
+from app.services.llm_service import llm_service
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class NoteService:
+    """Turn a YouTube video into notes, sharing work between concurrent requests"""
+    _flights = SingleFlight()
+
+    @staticmethod
+    def in_flight(video_id, language=None):
+        """Check whether notes for the video are already being generated"""
+        return NoteService._flights.in_flight((video_id, language))
+
+    @staticmethod
+    async def generate(video_id, language=None, progress=None):
+        """
+        Fetch the transcript, preferring one in the given language, and summarize it.
+        Concurrent requests for the same video and language await a single
+        shared job, and each progress tracker mirrors that job's progress.
+        """
+        return await NoteService._flights.do(
+            (video_id, language),
+            lambda job: NoteService._build_note(video_id, language, job),
+            progress=progress
+        )
+
+    @staticmethod
+    async def digest(notes, progress=None):
+        """Combine the notes of several videos into one digest"""
+        with STAGE_DURATION.time(stage="digest"):
+            return await llm_service.create_digest(
+                notes,
+                on_partial=progress.stream if progress else None
+            )
+
+    @staticmethod
+    async def _build_note(video_id, language, progress):
+        """Run the fetch and LLM stages for a single video"""
+        with STAGE_DURATION.time(stage="transcript"):
+            transcript, used_proxy = await YouTubeService.get_transcript(
+                video_id, language=language, progress=progress
+            )
+        TRANSCRIPT_CHARS.observe(len(transcript.text))
+
+        formatted_transcript = await NoteService._compact(video_id, transcript)
+
+        await progress.update_status(60, "processing_transcript")
+        with STAGE_DURATION.time(stage="summary"):
+            return await llm_service.process_transcript(
+                formatted_transcript,
+                video_id=video_id,
+                on_partial=progress.stream
+            )
+
+    @staticmethod
+    async def _compact(video_id, transcript):
+        """Compact the transcript within the token budget; return the text for the LLM"""
+        primary = llm_service.router.primary
+        with STAGE_DURATION.time(stage="compact"):
+            compacted, raw_tokens, compacted_tokens, tokens = await run_blocking(
+                "compact", prepare_transcript, transcript, primary.model if primary else None
+            )
+        TRANSCRIPT_TOKENS.observe(raw_tokens, kind="raw")
+        TRANSCRIPT_TOKENS.observe(tokens, kind="sent")
+        TRANSCRIPT_TOKENS_SAVED.inc(raw_tokens - compacted_tokens, reason="compaction")
+        TRANSCRIPT_TOKENS_SAVED.inc(compacted_tokens - tokens, reason="budget")
+        if tokens < compacted_tokens:
+            logger.warning(
+                f"Transcript of {video_id} cut to {tokens} of {compacted_tokens} tokens "
+                f"({compacted.duration:.0f}s of {transcript.duration:.0f}s) to fit the token budget"
+            )
+        logger.info(f"Transcript of {video_id}: {raw_tokens} tokens, {tokens} after compaction")
+        return compacted.text
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from app.config import (
+    PROXY_LIST, PROXY_POOL_SIZE, PROXY_RACE_SIZE, PROXY_REFRESH_INTERVAL, PROXY_TIMEOUT
+)
+from app.database.models import ProxyRecord, get_db
+from app.database.repository import ProxyRepository
+from app.services.executor import run_blocking, run_blocking_with_timeout
+
+logger = logging.getLogger(__name__)
+
+
+class ProxyStats:
+    """Success and latency statistics for one proxy"""
+    __slots__ = ("address", "successes", "failures", "latency")
+
+    # Weight of the newest sample in the latency moving average
+    LATENCY_ALPHA = 0.3
+
+    def __init__(self, address, successes=0, failures=0, latency=None):
+        self.address = address
+        self.successes = successes
+        self.failures = failures
+        self.latency = latency
+
+    def record(self, success, latency=None):
+        """Record the outcome of a request through this proxy"""
+        if success:
+            self.successes += 1
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.LATENCY_ALPHA * (latency - self.latency)
+        else:
+            self.failures += 1
+
+    @property
+    def score(self):
+        """Higher is better: smoothed success rate divided by expected latency"""
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        latency = self.latency if self.latency is not None else PROXY_TIMEOUT / 2
+        return success_rate / max(latency, 0.05)
+
+
+class ProxyPool:
+    """Scored proxy pool that refreshes in the background and races the best proxies"""
+    def __init__(self, max_size=PROXY_POOL_SIZE):
+        self.max_size = max_size
+        self._proxies = {}
+        self._refresh_task = None
+        self._refresh_lock = asyncio.Lock()
+
+    @staticmethod
+    def _fetch_candidates():
+        """Get candidate proxy addresses (blocking, runs in the worker pool)"""
+        if PROXY_LIST:
+            return list(PROXY_LIST)
+        # pyfreeproxies fetches its configuration over the network at import time
+        from pyfreeproxies import FreeProxies
+        return list(FreeProxies().get_confirmed_working_proxies())
+
+    def load(self):
+        """Load persisted proxy scores"""
+        with get_db() as db:
+            for record in ProxyRepository.get_proxies(db):
+                self._proxies[record.address] = ProxyStats(
+                    record.address, record.successes or 0, record.failures or 0, record.latency
+                )
+
+    def save(self):
+        """Persist proxy scores"""
+        now = datetime.utcnow()
+        records = [
+            ProxyRecord(
+                address=stats.address,
+                successes=stats.successes,
+                failures=stats.failures,
+                latency=stats.latency,
+                last_checked=now
+            )
+            for stats in self._proxies.values()
+        ]
+        with get_db() as db:
+            ProxyRepository.replace_proxies(db, records)
+
+    async def refresh(self):
+        """Merge fresh candidates into the pool and drop the worst-scoring proxies"""
+        async with self._refresh_lock:
+            try:
+                candidates = await run_blocking("fetch", self._fetch_candidates)
+            except Exception as e:
+                logger.warning(f"Proxy refresh failed: {str(e)}")
+                return
+            for address in candidates:
+                if address not in self._proxies:
+                    self._proxies[address] = ProxyStats(address)
+            if len(self._proxies) > self.max_size:
+                ranked = sorted(self._proxies.values(), key=lambda s: s.score, reverse=True)
+                self._proxies = {s.address: s for s in ranked[:self.max_size]}
+            await run_blocking("cache", self.save)
+
+    async def start(self):
+        """Load persisted scores and start refreshing in the background"""
+        await run_blocking("cache", self.load)
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stop background refreshing and persist scores"""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+        await run_blocking("cache", self.save)
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(PROXY_REFRESH_INTERVAL)
+
+    def ranked(self):
+        """Return proxy addresses from best to worst score"""
+        ranked = sorted(self._proxies.values(), key=lambda s: s.score, reverse=True)
+        return [stats.address for stats in ranked]
+
+    async def race(self, func, proxies, timeout=PROXY_TIMEOUT, final_errors=()):
+        """
+        Call func(proxy) for every proxy concurrently in the worker pool.
+        Return (result, proxy) from the first success and cancel the rest.
+        Raise the last error if every proxy fails or times out. Errors in
+        final_errors are answers about the request rather than proxy
+        failures: the first one is raised at once and no proxy is blamed.
+        """
+        def timed(proxy):
+            started = time.monotonic()
+            return func(proxy), time.monotonic() - started
+
+        async def attempt(proxy):
+            try:
+                # Only the request itself is timed, so a proxy is not blamed for a busy worker pool
+                result, latency = await run_blocking_with_timeout("fetch", timeout, timed, proxy)
+            except (asyncio.CancelledError, *final_errors):
+                raise
+            except Exception:
+                self._proxies.setdefault(proxy, ProxyStats(proxy)).record(False)
+                raise
+            self._proxies.setdefault(proxy, ProxyStats(proxy)).record(True, latency)
+            return result, proxy
+
+        tasks = [asyncio.create_task(attempt(proxy)) for proxy in proxies]
+        last_error = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    return await next_done
+                except final_errors:
+                    raise
+                except Exception as e:
+                    last_error = e
+        finally:
+            for task in tasks:
+                task.cancel()
+        raise last_error or Exception("No proxies available")
+
+    async def fetch(self, func, rounds, on_round=None, final_errors=()):
+        """
+        Race the best PROXY_RACE_SIZE untried proxies, for up to `rounds` rounds.
+        on_round(number) is awaited before each round. An error in
+        final_errors ends the fetch (see race).
+        """
+        if not self._proxies:
+            await self.refresh()
+        ranked = self.ranked()
+        last_error = None
+        for number in range(rounds):
+            batch = ranked[number * PROXY_RACE_SIZE:(number + 1) * PROXY_RACE_SIZE]
+            if not batch:
+                break
+            if on_round:
+                await on_round(number + 1)
+            try:
+                return await self.race(func, batch, final_errors=final_errors)
+            except final_errors:
+                raise
+            except Exception as e:
+                last_error = e
+        raise last_error or Exception("No proxies available")
+
+
+proxy_pool = ProxyPool()
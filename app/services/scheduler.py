@@ -0,0 +1,176 @@
+import asyncio
+import contextvars
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from app.config import MAX_ACTIVE_JOBS, MAX_JOBS_PER_USER
+
+logger = logging.getLogger(__name__)
+
+# The chat whose work is running in the current task; used for fair stage scheduling
+current_owner = contextvars.ContextVar("current_owner", default=None)
+
+
+class QueueFullError(Exception):
+    """Raised when an owner already has the maximum number of queued jobs"""
+
+
+class _Waiter:
+    __slots__ = ("owner", "future", "on_position", "position")
+
+    def __init__(self, owner, future, on_position):
+        self.owner = owner
+        self.future = future
+        self.on_position = on_position
+        self.position = None
+
+
+class FairScheduler:
+    """
+    Concurrency limiter that hands out free slots round-robin across owners,
+    so one owner with many queued jobs cannot starve the others.
+    """
+    def __init__(self, capacity, max_per_owner=None):
+        self.capacity = capacity
+        self.max_per_owner = max_per_owner
+        self.active = 0
+        self._queues = OrderedDict()
+        self._owned = {}
+        self._room_waiters = {}  # owner -> futures waiting for the owner to drop below its limit
+
+    def is_full(self, owner):
+        """Check whether the owner has reached its job limit"""
+        return self.max_per_owner is not None and self._owned.get(owner, 0) >= self.max_per_owner
+
+    @property
+    def waiting(self):
+        """Number of queued acquisitions"""
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def acquire(self, owner=None, on_position=None, wait=False):
+        """
+        Wait for a slot. on_position(position) is awaited in the background
+        whenever the 1-based queue position of this request changes. An
+        owner at its job limit gets QueueFullError, or with wait=True waits
+        until one of its jobs finishes.
+        """
+        while self.is_full(owner):
+            if not wait:
+                raise QueueFullError(f"Too many queued jobs for {owner}")
+            await self._wait_for_room(owner)
+        self._owned[owner] = self._owned.get(owner, 0) + 1
+
+        if self.active < self.capacity and not self._queues:
+            self.active += 1
+            return
+
+        waiter = _Waiter(owner, asyncio.get_running_loop().create_future(), on_position)
+        self._queues.setdefault(owner, deque()).append(waiter)
+        self._report_positions()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Slot was granted as we were cancelled; hand it on
+                self._release_slot()
+            else:
+                self._remove_waiter(waiter)
+            self._disown(owner)
+            raise
+
+    def release(self, owner=None):
+        """Release a slot and grant it to the next owner in round-robin order"""
+        self._disown(owner)
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, owner=None, on_position=None, wait=False):
+        """Hold a slot for the duration of the block"""
+        await self.acquire(owner, on_position, wait)
+        try:
+            yield
+        finally:
+            self.release(owner)
+
+    def _release_slot(self):
+        self.active -= 1
+        while self._queues and self.active < self.capacity:
+            owner, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                # Owner still has work queued: move it behind everyone else
+                self._queues.move_to_end(owner)
+            else:
+                del self._queues[owner]
+            if waiter.future.done():
+                continue
+            self.active += 1
+            waiter.future.set_result(None)
+        self._report_positions()
+
+    def _remove_waiter(self, waiter):
+        queue = self._queues.get(waiter.owner)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.owner]
+        self._report_positions()
+
+    async def _wait_for_room(self, owner):
+        future = asyncio.get_running_loop().create_future()
+        self._room_waiters.setdefault(owner, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Woken as we were cancelled; hand the room on
+                self._wake_for_room(owner)
+            raise
+        finally:
+            waiters = self._room_waiters.get(owner)
+            if waiters and future in waiters:
+                waiters.remove(future)
+            if not waiters:
+                self._room_waiters.pop(owner, None)
+
+    def _disown(self, owner):
+        remaining = self._owned.get(owner, 0) - 1
+        if remaining > 0:
+            self._owned[owner] = remaining
+        else:
+            self._owned.pop(owner, None)
+        self._wake_for_room(owner)
+
+    def _wake_for_room(self, owner):
+        """Let the next job waiting for room under the owner's limit try again"""
+        for future in self._room_waiters.get(owner, ()):
+            if not future.done():
+                future.set_result(None)
+                break
+
+    def _report_positions(self):
+        """Tell waiters whose round-robin position changed"""
+        queues = list(self._queues.values())
+        for owner_index, queue in enumerate(queues):
+            for index, waiter in enumerate(queue):
+                # Owners ahead in the rotation get index + 1 turns first, the rest index turns
+                position = 1 + sum(
+                    min(len(other), index + (1 if other_index < owner_index else 0))
+                    for other_index, other in enumerate(queues)
+                )
+                if position != waiter.position:
+                    waiter.position = position
+                    if waiter.on_position:
+                        asyncio.ensure_future(self._notify(waiter, position))
+
+    @staticmethod
+    async def _notify(waiter, position):
+        try:
+            await waiter.on_position(position)
+        except Exception as e:
+            logger.warning(f"Queue position update failed: {str(e)}")
+
+
+# Admission control for whole note-taking jobs
+job_scheduler = FairScheduler(MAX_ACTIVE_JOBS, MAX_JOBS_PER_USER)
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SharedJob:
+    """An in-flight job whose progress is mirrored to every subscribed tracker"""
+    def __init__(self):
+        self.subscribers = []
+        self.last_status = None
+        self.last_text = None
+        self.task = None
+
+    async def subscribe(self, progress):
+        """Attach a progress tracker and bring it up to the latest status"""
+        if progress is None:
+            return
+        self.subscribers.append(progress)
+        if self.last_status:
+            percentage, keys, kwargs = self.last_status
+            await self._notify([progress], percentage, keys, kwargs)
+        if self.last_text:
+            await progress.stream(self.last_text)
+
+    def unsubscribe(self, progress):
+        """Detach a progress tracker"""
+        if progress in self.subscribers:
+            self.subscribers.remove(progress)
+
+    async def update_status(self, percentage, *keys, **kwargs):
+        """Broadcast a status update to all subscribers"""
+        self.last_status = (percentage, keys, kwargs)
+        await self._notify(list(self.subscribers), percentage, keys, kwargs)
+
+    async def stream(self, text):
+        """Broadcast partially generated output to all subscribers"""
+        self.last_text = text
+        for progress in list(self.subscribers):
+            try:
+                await progress.stream(text)
+            except Exception as e:
+                logger.warning(f"Streaming update failed: {str(e)}")
+
+    @staticmethod
+    async def _notify(subscribers, percentage, keys, kwargs):
+        """Send a status update to trackers without letting one failure stop the rest"""
+        results = await asyncio.gather(
+            *(progress.update_status(percentage, *keys, **kwargs) for progress in subscribers),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Progress update failed: {str(result)}")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared job"""
+    def __init__(self):
+        self._jobs = {}
+
+    def in_flight(self, key):
+        """Check whether a job for the key is currently running"""
+        return key in self._jobs
+
+    async def do(self, key, func, progress=None):
+        """
+        Run func(job) once per key and return its result to every caller.
+        func receives the SharedJob, which it should use to report progress.
+        """
+        job = self._jobs.get(key)
+        if job is None:
+            job = SharedJob()
+            self._jobs[key] = job
+            job.task = asyncio.create_task(self._run(key, job, func))
+
+        await job.subscribe(progress)
+        try:
+            # Shield so one requester cancelling does not cancel the shared job
+            return await asyncio.shield(job.task)
+        finally:
+            job.unsubscribe(progress)
+
+    async def _run(self, key, job, func):
+        try:
+            return await func(job)
+        finally:
+            self._jobs.pop(key, None)
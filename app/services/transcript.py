@@ -0,0 +1,104 @@
+import json
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Version tag of the serialized form; cached content without it is a miss
+FORMAT_VERSION = 1
+
+
+class Transcript:
+    """
+    Timed caption segments of one video, stored column-wise: segment start
+    and duration in milliseconds in two int arrays, segment text in a list.
+    available_languages lists the languages of every transcript the video
+    has, when known.
+    """
+    __slots__ = ("language", "is_generated", "starts", "durations", "texts", "available_languages")
+
+    def __init__(self, language, is_generated=False, starts=(), durations=(), texts=(), available_languages=()):
+        self.language = language
+        self.is_generated = is_generated
+        self.starts = array("i", starts)
+        self.durations = array("i", durations)
+        self.texts = list(texts)
+        self.available_languages = list(available_languages)
+
+    @classmethod
+    def from_snippets(cls, snippets, language, is_generated=False, available_languages=()):
+        """Build a transcript from objects with start, duration (seconds) and text"""
+        transcript = cls(language, is_generated, available_languages=available_languages)
+        for snippet in snippets:
+            text = snippet.text.strip()
+            if text:
+                transcript.append(snippet.start, snippet.duration, text)
+        return transcript
+
+    def append(self, start, duration, text):
+        """Add a segment; start and duration are in seconds"""
+        self.starts.append(round(start * 1000))
+        self.durations.append(round(duration * 1000))
+        self.texts.append(text)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        """Yield (start, duration, text) segments, times in seconds"""
+        for start, duration, text in zip(self.starts, self.durations, self.texts):
+            yield start / 1000, duration / 1000, text
+
+    @property
+    def text(self):
+        """Plain text, one line per segment"""
+        return "\n".join(self.texts)
+
+    @property
+    def duration(self):
+        """Seconds from the start of the video to the end of the last segment"""
+        if not self.texts:
+            return 0.0
+        return (self.starts[-1] + self.durations[-1]) / 1000
+
+    def index_at(self, seconds):
+        """Index of the segment playing at the given time (the last one starting before it)"""
+        return max(0, bisect_right(self.starts, round(seconds * 1000)) - 1)
+
+    def slice(self, start=None, end=None):
+        """Return the segments that start within [start, end) seconds"""
+        low = 0 if start is None else bisect_left(self.starts, round(start * 1000))
+        high = len(self.texts) if end is None else bisect_left(self.starts, round(end * 1000))
+        return Transcript(
+            self.language,
+            self.is_generated,
+            self.starts[low:high],
+            self.durations[low:high],
+            self.texts[low:high]
+        )
+
+    def dumps(self):
+        """Serialize for the transcript cache"""
+        return json.dumps({
+            "v": FORMAT_VERSION,
+            "language": self.language,
+            "generated": self.is_generated,
+            "starts": self.starts.tolist(),
+            "durations": self.durations.tolist(),
+            "texts": self.texts,
+            "available": self.available_languages,
+        }, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, content):
+        """Deserialize cached content, or return None if it is not a serialized transcript"""
+        if not content.startswith("{"):
+            return None
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return None
+        if not isinstance(data, dict) or data.get("v") != FORMAT_VERSION:
+            return None
+        return cls(
+            data["language"], data["generated"], data["starts"], data["durations"], data["texts"],
+            data.get("available", ())
+        )
@@ -1,13 +1,35 @@
+import functools
 import re
+import time
 import requests
 from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import NoTranscriptFound, TranscriptsDisabled
-from youtube_transcript_api.formatters import TextFormatter
-from pyfreeproxies import FreeProxies
+from youtube_transcript_api._errors import (
+    AgeRestricted, InvalidVideoId, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+)
+
+from app.config import FETCH_TIMEOUT, PROXY_TIMEOUT, PROXY_MAX_ROUNDS, MAX_BATCH_VIDEOS
+from app.metrics import STAGE_DURATION, TRANSCRIPT_FETCHES
+from app.services.cache_service import transcript_cache
+from app.services.executor import run_blocking
+from app.services.proxy_pool import proxy_pool
+from app.services.transcript import Transcript
+
+class TranscriptUnavailableError(Exception):
+    """Raised when no transcript could be fetched for a video"""
+
+# Errors that describe the video, not the connection: fetching through a proxy gives the same answer
+CONTENT_ERRORS = (
+    TranscriptUnavailableError, TranscriptsDisabled, NoTranscriptFound, VideoUnavailable,
+    InvalidVideoId, AgeRestricted
+)
 
 class YouTubeService:
     YOUTUBE_URL_PATTERN = r'(?:youtube\.com\/(?:[^\/]+\/.+\/|(?:v|e(?:mbed)?)\/|.*[?&]v=)|youtu\.be\/)([^"&?\/\s]{11})'
 
+    PLAYLIST_URL_PATTERN = r'youtube\.com\/playlist\?(?:[^\s]*&)?list=([\w-]+)'
+    PLAYLIST_VIDEO_PATTERN = re.compile(r'"videoId":"([\w-]{11})"')
+    PLAYLIST_PAGE_URL = "https://www.youtube.com/playlist?list={playlist_id}"
+
     @staticmethod
     def extract_video_id(url):
         match = re.search(YouTubeService.YOUTUBE_URL_PATTERN, url, re.IGNORECASE)
@@ -16,50 +38,143 @@ class YouTubeService:
         return None
 
     @staticmethod
-    async def get_transcript(video_id, progress=None, lang=None):
+    def extract_video_ids(text):
+        """Return every video ID in the text, in order and without duplicates"""
+        # Match link by link: the single-URL pattern can run across whitespace
+        video_ids = (YouTubeService.extract_video_id(word) for word in text.split())
+        return list(dict.fromkeys(video_id for video_id in video_ids if video_id))
+
+    @staticmethod
+    def extract_playlist_ids(text):
+        """Return the IDs of every playlist link in the text"""
+        playlist_ids = re.findall(YouTubeService.PLAYLIST_URL_PATTERN, text, re.IGNORECASE)
+        return list(dict.fromkeys(playlist_ids))
+
+    @staticmethod
+    def _fetch_playlist_video_ids(playlist_id):
+        """Read the video IDs listed on a playlist page (blocking, runs in the worker pool)"""
+        response = requests.get(
+            YouTubeService.PLAYLIST_PAGE_URL.format(playlist_id=playlist_id),
+            headers={"Accept-Language": "en-US,en;q=0.9"},
+            timeout=FETCH_TIMEOUT
+        )
+        response.raise_for_status()
+        video_ids = YouTubeService.PLAYLIST_VIDEO_PATTERN.findall(response.text)
+        return list(dict.fromkeys(video_ids))
+
+    @staticmethod
+    async def collect_video_ids(text, limit=MAX_BATCH_VIDEOS):
+        """
+        Return (video_ids, truncated) for every video linked in the text,
+        with playlists expanded into their videos, capped at limit videos.
+        """
+        video_ids = YouTubeService.extract_video_ids(text)
+        for playlist_id in YouTubeService.extract_playlist_ids(text):
+            if len(video_ids) > limit:
+                break
+            with STAGE_DURATION.time(stage="playlist"):
+                playlist_videos = await run_blocking(
+                    "fetch", YouTubeService._fetch_playlist_video_ids, playlist_id
+                )
+            video_ids.extend(video_id for video_id in playlist_videos if video_id not in video_ids)
+        return video_ids[:limit], len(video_ids) > limit
+
+    @staticmethod
+    def _choose_transcript(transcript_list, language=None):
         """
-        Try to fetch transcript without proxy first, then with proxies if needed.
+        Pick the transcript to use: a manual one in the language, then a
+        generated one in the language, then any manual one, then any generated one.
+        """
+        if language:
+            for find in (transcript_list.find_manually_created_transcript,
+                         transcript_list.find_generated_transcript):
+                try:
+                    return find([language])
+                except NoTranscriptFound:
+                    pass
+        # TranscriptList yields manual transcripts before generated ones
+        for transcript in transcript_list:
+            return transcript
+        raise TranscriptUnavailableError("No transcript is available for this video")
+
+    @staticmethod
+    def _fetch_transcript(video_id, proxy=None, language=None):
+        """Fetch a transcript with its segment timings (blocking, runs in the worker pool)"""
+        session = requests.Session()
+        # Bound every request so a stalled connection cannot hold a worker thread
+        session.request = functools.partial(
+            session.request, timeout=PROXY_TIMEOUT if proxy else FETCH_TIMEOUT
+        )
+        if proxy:
+            session.proxies = {
+                'http': proxy,
+                'https': proxy,
+            }
+        ytt_api = YouTubeTranscriptApi(http_client=session)
+        transcript_list = ytt_api.list(video_id)
+        fetched = YouTubeService._choose_transcript(transcript_list, language).fetch()
+        return Transcript.from_snippets(
+            fetched, fetched.language_code, fetched.is_generated,
+            available_languages=[transcript.language_code for transcript in transcript_list]
+        )
+
+    @staticmethod
+    async def get_transcript(video_id, language=None, progress=None):
+        """
+        Return (Transcript, used_proxy), preferring a transcript in the given language.
+        Try to fetch transcript without proxy first, then race pooled proxies if needed.
         Optionally update progress tracker if provided.
+        Cached transcripts are returned without fetching.
         """
+        cached = await transcript_cache.aget(video_id, language)
+        if cached is not None:
+            return cached, False
+
         # Try without proxy
+        started = time.perf_counter()
         try:
-            if progress and lang:
-                await progress.update(
-                    40,
-                    lang["fetching_transcript"]
-                    + lang["no_proxy"]
+            if progress:
+                await progress.update_status(40, "fetching_transcript", "no_proxy")
+            transcript = await run_blocking(
+                "fetch", YouTubeService._fetch_transcript, video_id, language=language
+            )
+            STAGE_DURATION.observe(time.perf_counter() - started, stage="fetch_direct")
+            TRANSCRIPT_FETCHES.inc(method="direct", proxy_round="0", outcome="success")
+            await transcript_cache.aput(video_id, transcript)
+            return transcript, False  # False: no proxy used
+        except CONTENT_ERRORS as e:
+            TRANSCRIPT_FETCHES.inc(method="direct", proxy_round="0", outcome="unavailable")
+            raise TranscriptUnavailableError(f"Transcript error: {str(e)}") from e
+        except Exception as e:
+            TRANSCRIPT_FETCHES.inc(method="direct", proxy_round="0", outcome="failure")
+            first_exc = e  # Will try proxies
+
+        # Race the best-scoring proxies
+        current_round = [0]
+
+        async def report_round(number):
+            current_round[0] = number
+            if progress:
+                await progress.update_status(
+                    40, "fetching_transcript", "using_proxy", number=number
                 )
-            session = requests.Session()
-            ytt_api = YouTubeTranscriptApi(http_client=session)
-            transcript_list = ytt_api.list(video_id)
-            transcript = transcript_list._generated_transcripts[list(transcript_list._generated_transcripts.keys())[0]].fetch()
-            text_formatted = TextFormatter().format_transcript(transcript)
-            return text_formatted, False  # False: no proxy used
-        except Exception as first_exc:
-            pass  # Will try proxies
-
-        # Try with proxies
-        proxy = FreeProxies()
-        proxy_list = list(proxy.get_confirmed_working_proxies())
-        for idx, proxy in enumerate(proxy_list):
-            try:
-                if progress and lang:
-                    await progress.update(
-                        40,
-                        lang["fetching_transcript"]
-                        + lang["using_proxy"].format(number=idx + 1)
-                    )
-                session = requests.Session()
-                session.proxies = {
-                    'http': proxy,
-                    'https': proxy,
-                }
-                ytt_api = YouTubeTranscriptApi(http_client=session)
-                transcript_list = ytt_api.list(video_id)
-                transcript = transcript_list._generated_transcripts[list(transcript_list._generated_transcripts.keys())[0]].fetch()
-                text_formatted = TextFormatter().format_transcript(transcript)
-                return text_formatted, True  # True: proxy used
-            except Exception:
-                continue
-        # If all proxies fail, raise the first error
-        raise Exception(f"Transcript error: {str(first_exc)}")
\ No newline at end of file
+
+        started = time.perf_counter()
+        try:
+            transcript, proxy = await proxy_pool.fetch(
+                functools.partial(YouTubeService._fetch_transcript, video_id, language=language),
+                PROXY_MAX_ROUNDS,
+                on_round=report_round,
+                final_errors=CONTENT_ERRORS
+            )
+        except CONTENT_ERRORS as e:
+            TRANSCRIPT_FETCHES.inc(method="proxy", proxy_round=str(current_round[0]), outcome="unavailable")
+            raise TranscriptUnavailableError(f"Transcript error: {str(e)}") from e
+        except Exception:
+            TRANSCRIPT_FETCHES.inc(method="proxy", proxy_round=str(current_round[0]), outcome="failure")
+            # If all proxies fail, raise the direct fetch error
+            raise TranscriptUnavailableError(f"Transcript error: {str(first_exc)}")
+        STAGE_DURATION.observe(time.perf_counter() - started, stage="fetch_proxy")
+        TRANSCRIPT_FETCHES.inc(method="proxy", proxy_round=str(current_round[0]), outcome="success")
+        await transcript_cache.aput(video_id, transcript)
+        return transcript, True  # True: proxy used
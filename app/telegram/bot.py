@@ -1,19 +1,63 @@
+import asyncio
+import logging
+import secrets
+
 from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, CallbackQueryHandler, filters
 
-from app.config import BOT_TOKEN
+from app.config import (
+    BOT_TOKEN, BOT_MODE, BOT_ROLE, CONCURRENT_UPDATES, LLM_PRELOAD, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH,
+    WEBHOOK_URL, WEBHOOK_SECRET_TOKEN, WEBHOOK_CERT, WEBHOOK_KEY
+)
+from app.database.models import init_db
+from app.metrics import metrics_server
+from app.services.executor import run_blocking, shutdown_executor
+from app.services.history_writer import history_writer
+from app.services.llm_router import preload_litellm
+from app.services.proxy_pool import proxy_pool
+from app.translations import translations
+from app.telegram.jobs import resume_jobs
 from app.telegram.handlers import (
     start_command,
     help_command,
     status_command,
     language_command,
     language_callback,
-    process_youtube_url
+    digest_command,
+    digest_unavailable_command,
+    clear_cache_command,
+    activate_command,
+    reload_languages_command,
+    stats_command,
+    process_youtube_url,
+    enqueue_youtube_url
 )
 
+logger = logging.getLogger(__name__)
+
+# Telegram opens at most this many simultaneous webhook connections
+MAX_WEBHOOK_CONNECTIONS = 100
+
 class TelegramBot:
-    def __init__(self):
-        """Initialize the Telegram bot"""
-        self.application = ApplicationBuilder().token(BOT_TOKEN).build()
+    def __init__(self, role=BOT_ROLE, request=None):
+        """
+        Initialize the Telegram bot. With role "all" it makes the notes
+        itself; with role "front" it only queues them for worker processes.
+        request replaces the Bot API transport (benchmarks use a local one).
+        """
+        if role not in ("all", "front"):
+            raise ValueError(f"Unknown bot role: {role}")
+        self.role = role
+        self._resume_tasks = []
+        builder = (
+            ApplicationBuilder()
+            .token(BOT_TOKEN)
+            .concurrent_updates(CONCURRENT_UPDATES)
+            .post_init(self._post_init)
+            .post_shutdown(self._post_shutdown)
+        )
+        if request is not None:
+            builder = builder.request(request).get_updates_request(request)
+        self.application = builder.build()
         self._register_handlers()
     
     def _register_handlers(self):
@@ -23,6 +67,16 @@ class TelegramBot:
         self.application.add_handler(CommandHandler("help", help_command))
         self.application.add_handler(CommandHandler("status", status_command))
         self.application.add_handler(CommandHandler("language", language_command))
+        # A digest combines several notes in one process, so front processes refuse it
+        self.application.add_handler(CommandHandler(
+            "digest", digest_unavailable_command if self.role == "front" else digest_command
+        ))
+        
+        # Admin command handlers
+        self.application.add_handler(CommandHandler("clearcache", clear_cache_command))
+        self.application.add_handler(CommandHandler("reloadlang", reload_languages_command))
+        self.application.add_handler(CommandHandler("stats", stats_command))
+        self.application.add_handler(CommandHandler(["activate", "deactivate"], activate_command))
         
         # Callback query handler for language selection
         self.application.add_handler(CallbackQueryHandler(language_callback, pattern="^lang_"))
@@ -30,9 +84,68 @@ class TelegramBot:
         # Message handlers
         self.application.add_handler(MessageHandler(
             filters.TEXT & ~filters.COMMAND, 
-            process_youtube_url
+            enqueue_youtube_url if self.role == "front" else process_youtube_url
         ))
     
-    def run(self):
-        """Run the bot"""
-        self.application.run_polling()
\ No newline at end of file
+    async def _post_init(self, application):
+        """Start background services once the application is initialized"""
+        await run_blocking("db", init_db)
+        # Front processes never fetch transcripts or call the LLM
+        if self.role == "all":
+            if LLM_PRELOAD:
+                preload_litellm()
+            await proxy_pool.start()
+        history_writer.start()
+        translations.start_watching()
+        metrics_server.start()
+        # In a split deployment the workers pick up unfinished jobs
+        if self.role == "all":
+            self._resume_tasks = await resume_jobs(application.bot)
+
+    async def _post_shutdown(self, application):
+        """Stop background services and release worker threads"""
+        # Resumed jobs still running are resumed again on the next start
+        for task in self._resume_tasks:
+            task.cancel()
+        await asyncio.gather(*self._resume_tasks, return_exceptions=True)
+        self._resume_tasks = []
+        metrics_server.stop()
+        translations.stop_watching()
+        if self.role == "all":
+            await proxy_pool.stop()
+        await history_writer.stop()
+        shutdown_executor(wait=False)
+
+    def run(self, mode=BOT_MODE):
+        """Run the bot, receiving updates by long polling or through a webhook"""
+        if mode == "webhook":
+            self.run_webhook()
+        elif mode == "polling":
+            self.application.run_polling()
+        else:
+            raise ValueError(f"Unknown bot mode: {mode}")
+    
+    def run_webhook(self):
+        """Serve the webhook over HTTP; Telegram must send the secret token with every update"""
+        self.application.run_webhook(**self.webhook_options())
+    
+    @staticmethod
+    def webhook_options():
+        """Arguments for the webhook server and its registration with Telegram"""
+        # Without it PTB registers http://WEBHOOK_LISTEN:WEBHOOK_PORT/..., which Telegram rejects
+        if not WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL must be set in webhook mode: the public HTTPS URL Telegram sends updates to")
+        secret_token = WEBHOOK_SECRET_TOKEN
+        if not secret_token:
+            secret_token = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET_TOKEN is not set; using a random token for this run")
+        return dict(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=secret_token,
+            cert=WEBHOOK_CERT,
+            key=WEBHOOK_KEY,
+            max_connections=min(CONCURRENT_UPDATES, MAX_WEBHOOK_CONNECTIONS)
+        )
\ No newline at end of file
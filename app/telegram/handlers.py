@@ -1,13 +1,23 @@
+import asyncio
 import logging
+import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from app.database.models import get_db
-from app.database.repository import UserRepository, MessageRepository
-from app.services.youtube_service import YouTubeService, TextFormatter
-from app.services.llm_service import LLMService
-from app.config import load_language , ADMIN_CHAT_ID
-from app.telegram.utils import ProgressTracker
+from app.services.youtube_service import YouTubeService, TranscriptUnavailableError
+from app.services.note_service import NoteService
+from app.services.llm_service import CACHED_TEMPLATES, llm_service
+from app.config import ADMIN_CHAT_ID, BATCH_CONCURRENCY, MAX_BATCH_VIDEOS, MAX_JOBS_PER_USER
+from app.translations import load_language, translations
+from app.metrics import STAGE_DURATION, JOBS, LLM_TOKENS, TRANSCRIPT_TOKENS_SAVED, cache_hit_rate
+from app.services.cache_service import summary_cache, user_cache, content_hash
+from app.services.executor import run_blocking
+from app.services.history_writer import history_writer
+from app.services.job_store import job_store
+from app.services.scheduler import job_scheduler, current_owner, QueueFullError
+from app.telegram.jobs import JobProgress, run_note_job
+from app.telegram.output import send_html
+from app.telegram.utils import BatchProgress, ProgressTracker
 
 # Set up logging
 logging.basicConfig(
@@ -23,12 +33,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     user_name = update.effective_user.first_name
     
-    # Get or create user in database
-    db = get_db()
-    user = UserRepository.get_user(db, chat_id)
+    # Get or create user
+    user, is_new = await user_cache.aget_or_create(chat_id, user_name, is_active = (chat_id == ADMIN_CHAT_ID))
     
-    if not user:
-        user = UserRepository.create_user(db, chat_id, user_name, is_active = (chat_id == ADMIN_CHAT_ID))
+    if is_new:
         # Inform admin about new user
         await context.bot.send_message(
             chat_id=ADMIN_CHAT_ID,
@@ -45,19 +53,17 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     
     # Get user language preference
-    db = get_db()
-    user = UserRepository.get_user(db, chat_id)
+    user = await user_cache.aget(chat_id)
     lang_code = user.language if user else "en"
     lang = load_language(lang_code)
-    await update.message.reply_text(lang["help_message"])
+    await update.message.reply_text(lang["help_message"].format(languages=", ".join(translations.codes())))
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /status command"""
     chat_id = update.effective_chat.id
     
     # Get user status
-    db = get_db()
-    user = UserRepository.get_user(db, chat_id)
+    user = await user_cache.aget(chat_id)
     
     if not user:
         lang = load_language("en")
@@ -76,18 +82,16 @@ async def language_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     
     # Get user
-    db = get_db()
-    user = UserRepository.get_user(db, chat_id)
+    user = await user_cache.aget(chat_id)
     lang_code = user.language if user else "en"
     lang = load_language(lang_code)
     
-    # Create language selection keyboard
-    keyboard = [
-        [
-            InlineKeyboardButton("English", callback_data="lang_en"),
-            InlineKeyboardButton("فارسی", callback_data="lang_fa")
-        ]
+    # Create language selection keyboard, two languages per row
+    buttons = [
+        InlineKeyboardButton(load_language(code)["language_name"], callback_data=f"lang_{code}")
+        for code in translations.codes()
     ]
+    keyboard = [buttons[i:i + 2] for i in range(0, len(buttons), 2)]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await update.message.reply_text(
@@ -99,90 +103,380 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle language selection callback"""
     query = update.callback_query
     chat_id = query.message.chat_id
-    selected_lang = query.data.split("_")[1]
+    # Language codes may contain underscores (pt_BR)
+    selected_lang = query.data.split("_", 1)[1]
     
-    # Update user language preference
-    db = get_db()
-    user = UserRepository.get_user(db, chat_id)
+    # Ignore buttons for languages that are no longer available
+    if not translations.is_available(selected_lang):
+        await query.answer()
+        return
     
-    if user:
-        UserRepository.update_user_language(db, chat_id, selected_lang)
+    # Update user language preference
+    await user_cache.aset_language(chat_id, selected_lang)
     
     # Load selected language
     lang = load_language(selected_lang)
     
-    # Determine language name
-    language_name = "English" if selected_lang == "en" else "فارسی"
-    response = lang["language_selected"].format(language=language_name)
+    response = lang["language_selected"].format(language=lang["language_name"])
     
     await query.answer()
     await query.edit_message_text(text=response)
 
-async def process_youtube_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Process YouTube URLs"""
-    chat_id = update.effective_chat.id
-    message_id = update.message.message_id
-    message_text = update.message.text
+async def clear_cache_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the admin /clearcache command
+
+    /clearcache             - drop summaries made with an outdated prompt template
+    /clearcache all         - drop every cached summary
+    /clearcache <video_id>  - drop cached summaries for one video
+    """
+    if update.effective_chat.id != ADMIN_CHAT_ID:
+        return
     
-    # Get user from database
-    db = get_db()
-    user = UserRepository.get_user(db, chat_id)
+    arg = context.args[0] if context.args else None
+    if arg == "all":
+        deleted = await run_blocking("cache", summary_cache.invalidate)
+    elif arg:
+        deleted = await run_blocking("cache", summary_cache.invalidate, video_id=arg)
+    else:
+        deleted = await run_blocking(
+            "cache", summary_cache.invalidate,
+            keep_template_hashes=[content_hash(template) for template in CACHED_TEMPLATES]
+        )
     
+    await update.message.reply_text(f"Removed {deleted} cached summaries.")
+
+async def activate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the admin /activate and /deactivate commands: /activate <chat_id>"""
+    if update.effective_chat.id != ADMIN_CHAT_ID:
+        return
+    
+    command = update.message.text.split()[0].lstrip("/").split("@")[0]
+    if not context.args or not context.args[0].lstrip("-").isdigit():
+        await update.message.reply_text(f"Usage: /{command} <chat_id>")
+        return
+    
+    chat_id = int(context.args[0])
+    is_active = command == "activate"
+    # Goes through the user cache, so the change applies to the next message right away
+    user = await user_cache.aset_active(chat_id, is_active)
     if not user:
-        # Create user if not exists
-        user_name = update.effective_user.first_name
-        user = UserRepository.create_user(db, chat_id, user_name)
+        await update.message.reply_text(f"Unknown user {chat_id}.")
+        return
+    await update.message.reply_text(f"User {user.name} ({chat_id}) is now {'active' if is_active else 'inactive'}.")
+
+async def reload_languages_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the admin /reloadlang command"""
+    if update.effective_chat.id != ADMIN_CHAT_ID:
+        return
+    
+    await run_blocking("cache", translations.load)
+    codes = ", ".join(translations.codes())
+    await update.message.reply_text(f"Reloaded languages: {codes}")
+
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the admin /stats command"""
+    if update.effective_chat.id != ADMIN_CHAT_ID:
+        return
+    
+    lines = ["Jobs:"]
+    for labels, value in sorted(JOBS.items(), key=lambda item: item[0]["outcome"]):
+        lines.append(f"  {labels['outcome']}: {value}")
+    
+    lines.append("Stages (count, avg, p95):")
+    for labels, count, mean, p95 in sorted(STAGE_DURATION.summary(), key=lambda item: item[0]["stage"]):
+        p95_text = f"≤{p95}s" if p95 is not None else ">120s"
+        lines.append(f"  {labels['stage']}: {count}, {mean:.2f}s, {p95_text}")
+    
+    lines.append("Caches:")
+    for cache in ("user", "transcript", "summary"):
+        hits, misses, hit_rate = cache_hit_rate(cache)
+        lines.append(f"  {cache}: {hits} hits, {misses} misses ({hit_rate:.0%})")
+    
+    lines.append("LLM providers (expected latency, error rate):")
+    for name, model, latency, error_rate in llm_service.router.snapshot():
+        lines.append(f"  {name} {model}: {latency:.2f}s, {error_rate:.0%}")
+    
+    lines.append("LLM tokens:")
+    for labels, value in sorted(LLM_TOKENS.items(), key=lambda item: (item[0]["model"], item[0]["kind"])):
+        lines.append(f"  {labels['model']} {labels['kind']}: {value}")
+    
+    lines.append("Transcript tokens saved:")
+    for reason in ("compaction", "budget"):
+        lines.append(f"  {reason}: {TRANSCRIPT_TOKENS_SAVED.get(reason=reason)}")
+    
+    await update.message.reply_text("\n".join(lines))
+
+async def _get_active_user(update: Update):
+    """Return the sender's profile, or None after telling an inactive user they cannot use the bot"""
+    chat_id = update.effective_chat.id
+    
+    # Get user, creating it if it does not exist
+    user, _ = await user_cache.aget_or_create(chat_id, update.effective_user.first_name)
     
     # Check if user is active
     if not user.is_active:
-        lang = load_language(user.language)
-        await update.message.reply_text(lang["inactive_user"])
-        return
+        await update.message.reply_text(load_language(user.language)["inactive_user"])
+        return None
     
     # Store the message
-    MessageRepository.create_message(db, message_id, chat_id, message_text)
+    await history_writer.record(update.message.message_id, chat_id, update.message.text)
+    return user
+
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /digest command: notes on every linked video plus a combined digest"""
+    user = await _get_active_user(update)
+    if not user:
+        return
+    
+    text = " ".join(context.args)
+    if not YouTubeService.extract_video_ids(text) and not YouTubeService.extract_playlist_ids(text):
+        await update.message.reply_text(load_language(user.language)["digest_usage"])
+        return
+    
+    await _process_batch(update, context, user.language, text, digest=True)
+
+async def digest_unavailable_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /digest in a front process, which only queues single-video jobs"""
+    user = await _get_active_user(update)
+    if not user:
+        return
+    await update.message.reply_text(load_language(user.language)["digest_unavailable"])
+
+async def _process_batch(update: Update, context: ContextTypes.DEFAULT_TYPE, lang_code, text, digest=False):
+    """Make notes on several videos in parallel, reporting progress in one message"""
+    chat_id = update.effective_chat.id
+    lang = load_language(lang_code)
+    
+    if job_scheduler.is_full(chat_id):
+        await update.message.reply_text(lang["queue_full"])
+        return
+    
+    current_owner.set(chat_id)
+    
+    progress = ProgressTracker(context, chat_id, lang_code)
+    await progress.start()
+    started = time.perf_counter()
+    tasks = []
+    
+    try:
+        # Collect video IDs, expanding playlists
+        await progress.update(5, lang["extracting_id"])
+        video_ids, truncated = await YouTubeService.collect_video_ids(text)
+        
+        if not video_ids:
+            JOBS.inc(outcome="invalid_url")
+            await progress.complete()
+            await update.message.reply_text(lang["invalid_url"])
+            return
+        
+        if truncated:
+            await update.message.reply_text(lang["batch_truncated"].format(limit=MAX_BATCH_VIDEOS))
+        
+        batch = BatchProgress(progress, len(video_ids), span=80 if digest else 95)
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        
+        async def run_one(index, video_id):
+            async with semaphore:
+                try:
+                    # Wait for room under the chat's job limit rather than failing the video
+                    return await run_note_job(chat_id, video_id, lang_code, batch.reporter(index), wait=True)
+                finally:
+                    await batch.mark_done(index)
+        
+        tasks = [
+            asyncio.create_task(run_one(index, video_id))
+            for index, video_id in enumerate(video_ids)
+        ]
+        
+        # Send each note as soon as it and every note before it are ready
+        notes = []
+        failed = []
+        for index, (video_id, task) in enumerate(zip(video_ids, tasks), 1):
+            link = f"https://youtu.be/{video_id}"
+            try:
+                note = await task
+            except TranscriptUnavailableError:
+                JOBS.inc(outcome="no_transcript")
+                failed.append(link)
+                continue
+            except Exception as e:
+                JOBS.inc(outcome="error")
+                logger.error(f"Error processing video {video_id}: {str(e)}")
+                failed.append(link)
+                continue
+            JOBS.inc(outcome="success")
+            notes.append(note)
+            with STAGE_DURATION.time(stage="telegram_send"):
+                await send_html(context.bot, chat_id, f"<b>{index}/{len(video_ids)}</b> {link}\n\n{note}")
+        
+        if digest and len(notes) > 1:
+            await progress.update_status(85, "creating_digest")
+            result = await NoteService.digest(notes, progress=progress)
+            if not await progress.finish_stream(result):
+                await send_html(context.bot, chat_id, result)
+        
+        await progress.complete()
+        
+        if failed:
+            await update.message.reply_text(lang["batch_failed"].format(videos="\n".join(failed)))
+        
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage="batch")
+        logger.info(f"Processed {len(notes)}/{len(video_ids)} videos for chat {chat_id} in {elapsed:.2f}s")
+        
+    except Exception as e:
+        JOBS.inc(outcome="error")
+        logger.error(f"Error processing batch: {str(e)}")
+        await progress.complete()
+        error_message = lang["processing_error"].format(error=str(e))
+        await update.message.reply_text(error_message)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def process_youtube_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Process YouTube URLs"""
+    chat_id = update.effective_chat.id
+    message_text = update.message.text
+    
+    user = await _get_active_user(update)
+    if not user:
+        return
     
     # Load language
-    lang = load_language(user.language)
+    lang_code = user.language
+    lang = load_language(lang_code)
+    
+    # Several links or a playlist are processed as a batch
+    if len(YouTubeService.extract_video_ids(message_text)) > 1 or YouTubeService.extract_playlist_ids(message_text):
+        await _process_batch(update, context, lang_code, message_text)
+        return
     
-    # Initialize progress tracker
-    progress = ProgressTracker(context, chat_id, user.language)
+    # Reject right away if this chat already has too many videos in progress
+    if job_scheduler.is_full(chat_id):
+        await update.message.reply_text(lang["queue_full"])
+        return
+    
+    # Attribute work started from this update to the chat for fair scheduling
+    current_owner.set(chat_id)
+    
+    # Initialize progress tracker; it also keeps the durable job record
+    progress = JobProgress(context, chat_id, lang_code)
     await progress.start()
+    started = time.perf_counter()
     
     try:
         # Extract video ID
         await progress.update(20, lang["extracting_id"])
-        video_id = YouTubeService.extract_video_id(message_text)
+        with STAGE_DURATION.time(stage="extract_id"):
+            video_id = YouTubeService.extract_video_id(message_text)
         
         if not video_id:
+            JOBS.inc(outcome="invalid_url")
             await progress.complete()
             await update.message.reply_text(lang["invalid_url"])
             return
         
-        # Get transcript
+        # Record the job so a restart can resume it
+        await progress.track(video_id, lang_code)
+        
+        # Get transcript and process with LLM
         try:
-            formatted_transcript, used_proxy = await YouTubeService.get_transcript(
-                video_id, progress=progress, lang=lang
-            )
-        except Exception:
+            result = await run_note_job(chat_id, video_id, lang_code, progress)
+        except TranscriptUnavailableError as e:
+            JOBS.inc(outcome="no_transcript")
+            await progress.set_state("failed", error=str(e))
             await progress.complete()
             await update.message.reply_text(lang["no_transcript"])
             return
-
-        # Process with LLM
-        await progress.update(60, lang["processing_transcript"])
-        llm_service = LLMService()
-        result = llm_service.process_transcript(formatted_transcript)
+        except QueueFullError as e:
+            JOBS.inc(outcome="queue_full")
+            await progress.set_state("failed", error=str(e))
+            await progress.complete()
+            await update.message.reply_text(lang["queue_full"])
+            return
         
-        # Send result
+        # Send result, unless it was already streamed into a reply
+        await progress.set_state("sending", result=result)
         await progress.update(80, lang["sending_result"])
-        await update.message.reply_text(result, parse_mode="HTML")
+        with STAGE_DURATION.time(stage="telegram_send"):
+            if not await progress.finish_stream(result):
+                await send_html(context.bot, chat_id, result)
         
         # Complete and remove progress message
         await progress.complete()
+        await progress.set_state("done")
+        
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.observe(elapsed, stage="total")
+        JOBS.inc(outcome="success")
+        logger.info(f"Processed video {video_id} for chat {chat_id} in {elapsed:.2f}s")
         
     except Exception as e:
+        JOBS.inc(outcome="error")
         logger.error(f"Error processing URL: {str(e)}")
+        await progress.set_state("failed", error=str(e))
         await progress.complete()
         error_message = lang["processing_error"].format(error=str(e))
-        await update.message.reply_text(error_message)
\ No newline at end of file
+        await update.message.reply_text(error_message)
+
+async def enqueue_youtube_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Queue notes on the linked videos for the worker processes (front process of a split deployment)"""
+    chat_id = update.effective_chat.id
+    message_text = update.message.text
+    
+    user = await _get_active_user(update)
+    if not user:
+        return
+    
+    lang_code = user.language
+    lang = load_language(lang_code)
+    
+    # Reject right away if this chat already has too many videos waiting or in progress
+    room = MAX_JOBS_PER_USER - await job_store.acount_open(chat_id)
+    if room <= 0:
+        JOBS.inc(outcome="queue_full")
+        await update.message.reply_text(lang["queue_full"])
+        return
+    
+    # Several links or a playlist: one job per video; workers start each note's progress message
+    if len(YouTubeService.extract_video_ids(message_text)) > 1 or YouTubeService.extract_playlist_ids(message_text):
+        video_ids, truncated = await YouTubeService.collect_video_ids(message_text)
+        if not video_ids:
+            JOBS.inc(outcome="invalid_url")
+            await update.message.reply_text(lang["invalid_url"])
+            return
+        # Only as many videos as the chat has room for in the queue
+        if len(video_ids) > room:
+            JOBS.inc(len(video_ids) - room, outcome="queue_full")
+            video_ids = video_ids[:room]
+            truncated = True
+        if truncated:
+            await update.message.reply_text(lang["batch_truncated"].format(limit=len(video_ids)))
+        # Jobs of one chat run in the order they were queued
+        queued = 0
+        for video_id in video_ids:
+            if await job_store.acreate(chat_id, video_id, lang_code) is not None:
+                queued += 1
+        if not queued:
+            await update.message.reply_text(lang["processing_error"].format(error="the videos could not be queued"))
+            return
+        JOBS.inc(queued, outcome="queued")
+        await update.message.reply_text(lang["batch_queued"].format(total=queued))
+        return
+    
+    video_id = YouTubeService.extract_video_id(message_text)
+    if not video_id:
+        JOBS.inc(outcome="invalid_url")
+        await update.message.reply_text(lang["invalid_url"])
+        return
+    
+    # Sent with its final text before the job exists: the worker that runs the
+    # job keeps updating this message, and no later edit from here may overwrite it
+    progress = ProgressTracker(context, chat_id, lang_code)
+    await progress.start(20, lang["job_queued"])
+    if await job_store.acreate(chat_id, video_id, lang_code, progress.message.message_id) is None:
+        await progress.complete()
+        await update.message.reply_text(lang["processing_error"].format(error="the job could not be queued"))
+        return
+    JOBS.inc(outcome="queued")
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from app.config import PROGRESS_EDIT_INTERVAL
+from app.metrics import JOBS, STAGE_DURATION
+from app.services.job_store import job_store
+from app.services.note_service import NoteService
+from app.services.scheduler import job_scheduler, current_owner
+from app.services.youtube_service import TranscriptUnavailableError
+from app.telegram.output import call_api, send_html
+from app.telegram.utils import ProgressTracker
+from app.translations import load_language
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress(ProgressTracker):
+    """ProgressTracker that keeps the request's durable job record in step with its progress"""
+    # Status keys NoteService reports when a stage starts, and the job state they mean
+    STAGES = {"fetching_transcript": "transcript", "processing_transcript": "summary"}
+
+    def __init__(self, context, chat_id, lang_code="en", min_interval=PROGRESS_EDIT_INTERVAL):
+        super().__init__(context, chat_id, lang_code, min_interval)
+        self.job_id = None
+        self.state = None
+        self._stream_recorded = False
+
+    def adopt(self, message_id):
+        """Keep updating a progress message that was sent earlier, possibly by another process"""
+        # Edits and deletion only need the message ID
+        self.message = SimpleNamespace(message_id=message_id)
+        self._shown = None
+
+    async def track(self, video_id, language):
+        """Record the job, with this tracker's progress message"""
+        self.job_id = await job_store.acreate(
+            self.chat_id, video_id, language,
+            self.message.message_id if self.message else None
+        )
+        self.state = "queued"
+
+    async def set_state(self, state, **fields):
+        """Persist the job's state and any other columns"""
+        self.state = state
+        await job_store.aupdate(self.job_id, state=state, **fields)
+
+    async def update_status(self, percentage, *keys, **kwargs):
+        await super().update_status(percentage, *keys, **kwargs)
+        state = self.STAGES.get(keys[0]) if keys else None
+        if state and state != self.state:
+            await self.set_state(state)
+
+    async def stream(self, text):
+        await super().stream(text)
+        # Remember the streamed preview so a restart can remove it
+        if self.job_id and not self._stream_recorded and self.streaming.message:
+            self._stream_recorded = True
+            await job_store.aupdate(self.job_id, stream_message_id=self.streaming.message.message_id)
+
+
+async def run_note_job(chat_id, video_id, lang_code, progress, wait=False):
+    """
+    Generate notes once the chat's turn comes up in the job queue. A chat
+    at its job limit gets QueueFullError, or with wait=True waits for room.
+    """
+    if NoteService.in_flight(video_id, lang_code):
+        # Joining a job that is already running needs no extra capacity
+        return await NoteService.generate(video_id, lang_code, progress=progress)
+
+    async def report_position(position):
+        await progress.update_status(20, "queue_position", position=position)
+
+    async with job_scheduler.slot(chat_id, on_position=report_position, wait=wait):
+        return await NoteService.generate(video_id, lang_code, progress=progress)
+
+
+async def resume_jobs(bot):
+    """
+    Start finishing the jobs a previous run left unfinished, replacing their
+    stale progress messages. Returns the tasks, for the caller to cancel on
+    shutdown; a cancelled job is resumed again on the next start.
+    """
+    try:
+        resumable, abandoned = await job_store.atake_unfinished()
+    except Exception as e:
+        logger.error(f"Unfinished jobs could not be loaded: {str(e)}")
+        return []
+    if resumable or abandoned:
+        logger.info(f"Resuming {len(resumable)} unfinished jobs, giving up on {len(abandoned)}")
+    return (
+        [asyncio.create_task(_abandon_job(bot, job)) for job in abandoned]
+        + [asyncio.create_task(_resume_job(bot, job)) for job in resumable]
+    )
+
+
+async def run_queued_job(bot, job):
+    """
+    Run a job a worker process claimed from the queue. The progress message
+    the front process sent is kept; a job whose previous worker was lost
+    drops that worker's streamed preview, or is given up after max attempts.
+    """
+    if job.attempts > job_store.max_attempts:
+        await job_store.aupdate(job.id, state="failed", error="abandoned after its worker was lost")
+        await _abandon_job(bot, job)
+        return
+    if job.stream_message_id:
+        await _delete_stale_messages(bot, job, job.stream_message_id)
+        await job_store.aupdate(job.id, stream_message_id=None)
+    await _run_stored_job(bot, job, outcome="success")
+
+
+async def _delete_stale_messages(bot, job, *message_ids):
+    """Delete the progress message and streamed preview, or just the given messages, left behind by an interrupted job"""
+    for message_id in message_ids or (job.progress_message_id, job.stream_message_id):
+        if not message_id:
+            continue
+        try:
+            await call_api("delete_message", bot.delete_message, chat_id=job.chat_id, message_id=message_id)
+        except Exception as e:
+            # Already gone, or too old for the Bot API to delete
+            logger.warning(f"Stale message {message_id} of job {job.id} could not be deleted: {str(e)}")
+
+
+async def _abandon_job(bot, job):
+    """Tell the user an interrupted job will not be finished"""
+    await _delete_stale_messages(bot, job)
+    JOBS.inc(outcome="abandoned")
+    lang = load_language(job.language)
+    try:
+        await call_api(
+            "send_message", bot.send_message,
+            chat_id=job.chat_id,
+            text=lang["job_abandoned"].format(link=f"https://youtu.be/{job.video_id}")
+        )
+    except Exception as e:
+        logger.warning(f"Could not notify chat {job.chat_id} about job {job.id}: {str(e)}")
+
+
+async def _resume_job(bot, job):
+    """Run an interrupted job again, in a new progress message"""
+    await _delete_stale_messages(bot, job)
+    await job_store.aupdate(job.id, progress_message_id=None, stream_message_id=None)
+    job.progress_message_id = None
+    lang = load_language(job.language)
+    await _run_stored_job(
+        bot, job, outcome="resumed",
+        notice=lang["job_resumed"].format(link=f"https://youtu.be/{job.video_id}")
+    )
+
+
+async def _run_stored_job(bot, job, outcome, notice=None):
+    """
+    Run a job from its stored record, from its last completed stage: a stored
+    result is sent as is, otherwise the cached transcript and summary are
+    reused, so finished work is not fetched or paid for twice.
+    """
+    current_owner.set(job.chat_id)
+    lang = load_language(job.language)
+    # ProgressTracker only needs context.bot
+    progress = JobProgress(SimpleNamespace(bot=bot), job.chat_id, job.language)
+    progress.job_id = job.id
+    progress.state = job.state
+    if job.progress_message_id:
+        progress.adopt(job.progress_message_id)
+
+    try:
+        result = job.result
+        if result is None:
+            if not progress.message:
+                await progress.start()
+                await job_store.aupdate(job.id, progress_message_id=progress.message.message_id)
+            if notice:
+                await progress.update(10, notice)
+            result = await run_note_job(job.chat_id, job.video_id, job.language, progress)
+            await progress.set_state("sending", result=result)
+            await progress.update(80, lang["sending_result"])
+
+        with STAGE_DURATION.time(stage="telegram_send"):
+            if not await progress.finish_stream(result):
+                await send_html(bot, job.chat_id, result)
+        await progress.complete()
+        await progress.set_state("done")
+        JOBS.inc(outcome=outcome)
+        logger.info(f"Finished job {job.id} ({job.video_id}) for chat {job.chat_id}")
+    except Exception as e:
+        if isinstance(e, TranscriptUnavailableError):
+            JOBS.inc(outcome="no_transcript")
+            message = lang["no_transcript"]
+        else:
+            JOBS.inc(outcome="error")
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            message = lang["processing_error"].format(error=str(e))
+        await progress.set_state("failed", error=str(e))
+        try:
+            await progress.complete()
+            await call_api("send_message", bot.send_message, chat_id=job.chat_id, text=message)
+        except Exception as notify_error:
+            logger.warning(f"Could not notify chat {job.chat_id} about job {job.id}: {str(notify_error)}")
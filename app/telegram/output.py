@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import re
+import time
+
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+
+from app.config import TELEGRAM_CHAT_INTERVAL, TELEGRAM_MAX_RETRIES
+from app.metrics import TELEGRAM_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+HTML_TAG_PATTERN = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9-]*)[^<>]*>')
+
+# Tags, entities, whitespace and words: the units an HTML note may be split between
+HTML_TOKEN_PATTERN = re.compile(r'<[^<>]*>|&#?\w+;|\s+|[^\s<&]+|.', re.DOTALL)
+
+# Chat ID -> monotonic time at which Telegram's flood control for the chat lifts
+_blocked_until = {}
+
+# Chat ID -> monotonic time of the latest Bot API call to the chat
+_last_call = {}
+
+
+def balance_html(text):
+    """
+    Make partial Telegram HTML safe to send: drop a trailing unfinished
+    tag or entity, drop stray closing tags and close any open tags.
+    """
+    last_open = text.rfind("<")
+    if last_open > text.rfind(">"):
+        text = text[:last_open]
+    last_amp = text.rfind("&")
+    if last_amp != -1 and ";" not in text[last_amp:] and len(text) - last_amp < 10:
+        text = text[:last_amp]
+
+    parts = []
+    stack = []
+    pos = 0
+    for match in HTML_TAG_PATTERN.finditer(text):
+        parts.append(text[pos:match.start()])
+        pos = match.end()
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            stack.append(name)
+            parts.append(match.group(0))
+        elif name in stack:
+            while stack:
+                open_name = stack.pop()
+                parts.append(f"</{open_name}>")
+                if open_name == name:
+                    break
+    parts.append(text[pos:])
+    parts.extend(f"</{name}>" for name in reversed(stack))
+    return "".join(parts)
+
+
+def _apply_tags(stack, piece):
+    """Return the (name, opening tag) stack of open tags after the piece"""
+    stack = list(stack)
+    for match in HTML_TAG_PATTERN.finditer(piece):
+        name = match.group(2).lower()
+        if not match.group(1):
+            stack.append((name, match.group(0)))
+        elif any(open_name == name for open_name, _ in stack):
+            while stack and stack.pop()[0] != name:
+                pass
+    return stack
+
+
+def _closing_tags(stack):
+    return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+
+def _pieces(text, limit):
+    """Break text into lines, and lines that cannot fit in one message into tokens"""
+    for line in text.splitlines(keepends=True):
+        if len(line) <= limit // 2:
+            yield line
+            continue
+        for token in HTML_TOKEN_PATTERN.findall(line):
+            # Only an unbroken run of plain text can be longer than a message
+            for start in range(0, len(token), limit // 2):
+                yield token[start:start + limit // 2]
+
+
+def split_html(text, limit=MAX_MESSAGE_LENGTH):
+    """
+    Split Telegram HTML into chunks of at most limit characters, breaking at
+    line ends where possible. Tags open at a break are closed at the end of
+    the chunk and reopened at the start of the next, so every chunk is valid.
+    """
+    if len(text) <= limit:
+        return [text]
+
+    chunks = []
+    stack = []
+    current = ""
+    for piece in _pieces(text, limit):
+        after = _apply_tags(stack, piece)
+        if current.strip() and len(current) + len(piece) + len(_closing_tags(after)) > limit:
+            chunks.append(current + _closing_tags(stack))
+            current = "".join(tag for _, tag in stack)
+        current += piece
+        stack = after
+    chunks.append(current + _closing_tags(stack))
+
+    # Skip chunks that hold nothing but whitespace and tags
+    return [
+        chunk.strip() for chunk in chunks
+        if HTML_TAG_PATTERN.sub("", chunk).strip()
+    ]
+
+
+def chat_ready_in(chat_id, interval=TELEGRAM_CHAT_INTERVAL):
+    """
+    Seconds until a non-essential call (a progress or preview edit) fits the
+    chat's rate budget: flood control has lifted and interval has passed
+    since the previous call to the chat.
+    """
+    now = time.monotonic()
+    return max(
+        0.0,
+        _blocked_until.get(chat_id, 0) - now,
+        _last_call.get(chat_id, -interval) + interval - now
+    )
+
+
+def _retry_seconds(error):
+    value = error.retry_after
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+async def call_api(method, func, retries=TELEGRAM_MAX_RETRIES, retry_on_timeout=True, **kwargs):
+    """
+    Call a Bot API method with keyword arguments, including chat_id. Flood
+    control (RetryAfter) is waited out for every later call to the same chat,
+    and network errors are retried with exponential backoff. BadRequest is
+    raised right away. A call that timed out may still have reached Telegram,
+    so pass retry_on_timeout=False where a repeat would show up twice.
+    """
+    chat_id = kwargs.get("chat_id")
+    for attempt in range(retries + 1):
+        wait = _blocked_until.get(chat_id, 0) - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        _last_call[chat_id] = time.monotonic()
+        try:
+            result = await func(**kwargs)
+        except RetryAfter as e:
+            TELEGRAM_REQUESTS.inc(method=method, outcome="retry_after")
+            _blocked_until[chat_id] = time.monotonic() + _retry_seconds(e)
+            if attempt == retries:
+                raise
+            logger.warning(f"Flood control for chat {chat_id}: waiting {_retry_seconds(e)}s")
+        except BadRequest:
+            TELEGRAM_REQUESTS.inc(method=method, outcome="rejected")
+            raise
+        except NetworkError as e:
+            TELEGRAM_REQUESTS.inc(method=method, outcome="network_error")
+            if attempt == retries or (isinstance(e, TimedOut) and not retry_on_timeout):
+                raise
+            logger.warning(f"Telegram {method} failed ({str(e)}), retrying")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+        else:
+            TELEGRAM_REQUESTS.inc(method=method, outcome="ok")
+            if _blocked_until.get(chat_id, 0) <= time.monotonic():
+                _blocked_until.pop(chat_id, None)
+            return result
+        finally:
+            _last_call[chat_id] = time.monotonic()
+
+
+async def send_html(bot, chat_id, text, **kwargs):
+    """Send an HTML note, split into as many messages as needed, in order; return the messages"""
+    messages = []
+    for chunk in split_html(text):
+        # A timed-out send is often delivered anyway; retrying it would repeat part of the note
+        messages.append(await call_api(
+            "send_message", bot.send_message, retry_on_timeout=False,
+            chat_id=chat_id, text=chunk, parse_mode="HTML", **kwargs
+        ))
+    return messages
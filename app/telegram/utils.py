@@ -1,42 +1,244 @@
-from app.config import load_language
+import asyncio
+import logging
+import time
+
+from telegram.error import BadRequest
+
+from app.config import PROGRESS_EDIT_INTERVAL, STREAM_EDIT_INTERVAL
+from app.metrics import PROGRESS_EDITS_SKIPPED
+from app.telegram.output import MAX_MESSAGE_LENGTH, balance_html, call_api, chat_ready_in, send_html, split_html
+from app.translations import load_language
+
+logger = logging.getLogger(__name__)
+
+class StreamingMessage:
+    """A reply message that is progressively edited as text streams in"""
+    def __init__(self, context, chat_id, min_interval=STREAM_EDIT_INTERVAL):
+        self.context = context
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.message = None
+        self._pending = None
+        self._sent = None
+        self._last_flush = 0.0
+        self._flush_task = None
+
+    async def push(self, text):
+        """Record the latest text; flush it in the background if the edit budget allows"""
+        self._pending = text
+        if self._flush_task and not self._flush_task.done():
+            return
+        if time.monotonic() - self._last_flush < self.min_interval or chat_ready_in(self.chat_id) > 0:
+            return
+        self._flush_task = asyncio.create_task(self._flush())
+
+    async def finish(self, text):
+        """
+        Replace the streamed preview with the final text.
+        Return False if the final text cannot be shown in this message.
+        """
+        if self._flush_task:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+        if not self.message:
+            return False
+        # A long note continues in follow-up messages after the streamed one
+        first, *rest = split_html(text)
+        if first != self._sent:
+            await call_api(
+                "edit_message_text", self.context.bot.edit_message_text,
+                chat_id=self.chat_id,
+                message_id=self.message.message_id,
+                text=first,
+                parse_mode="HTML"
+            )
+        for chunk in rest:
+            await send_html(self.context.bot, self.chat_id, chunk)
+        return True
+
+    async def _flush(self):
+        text = balance_html(self._pending[:MAX_MESSAGE_LENGTH - 100])
+        self._last_flush = time.monotonic()
+        if not text.strip() or text == self._sent:
+            return
+        try:
+            if self.message:
+                await call_api(
+                    "edit_message_text", self.context.bot.edit_message_text,
+                    chat_id=self.chat_id,
+                    message_id=self.message.message_id,
+                    text=text,
+                    parse_mode="HTML"
+                )
+            else:
+                self.message = await call_api(
+                    "send_message", self.context.bot.send_message, retry_on_timeout=False,
+                    chat_id=self.chat_id,
+                    text=text,
+                    parse_mode="HTML"
+                )
+            self._sent = text
+        except BadRequest as e:
+            # A malformed partial note is skipped; the next flush or the final text replaces it
+            logger.warning(f"Streamed edit rejected: {str(e)}")
+        except Exception as e:
+            logger.warning(f"Streamed edit failed: {str(e)}")
+        finally:
+            self._last_flush = time.monotonic()
+
 
 class ProgressTracker:
     """Helper class to track and update progress messages"""
-    def __init__(self, context, chat_id, lang_code="en"):
+    def __init__(self, context, chat_id, lang_code="en", min_interval=PROGRESS_EDIT_INTERVAL):
         self.context = context
         self.chat_id = chat_id
+        self.min_interval = min_interval
         self.message = None
+        self.streaming = None
         self.lang = load_language(lang_code)
-    
-    async def start(self):
-        """Start tracking with 0% progress"""
-        text = self._format_progress_message(0, self.lang["progress_start"])
-        self.message = await self.context.bot.send_message(
+        self._pending = None
+        self._shown = None
+        self._last_edit = 0.0
+        self._edit_task = None
+
+    async def start(self, percentage=0, status_message=None):
+        """Start tracking with 0% progress, or the given progress and status"""
+        text = self._format_progress_message(percentage, status_message or self.lang["progress_start"])
+        self.message = await call_api(
+            "send_message", self.context.bot.send_message,
             chat_id=self.chat_id,
             text=text
         )
+        self._shown = text
+        self._last_edit = time.monotonic()
         return self.message
-    
+
     async def update(self, percentage, status_message):
-        """Update progress message"""
-        text = self._format_progress_message(percentage, status_message)
-        if self.message:
-            await self.context.bot.edit_message_text(
-                chat_id=self.chat_id,
-                message_id=self.message.message_id,
-                text=text
-            )
-    
+        """
+        Update progress message. Edits run in the background, at most one per
+        min_interval; only the latest status is shown and unchanged text is skipped.
+        """
+        if self._pending is not None and self._pending != self._shown:
+            PROGRESS_EDITS_SKIPPED.inc()
+        self._pending = self._format_progress_message(percentage, status_message)
+        if self.message and (self._edit_task is None or self._edit_task.done()):
+            self._edit_task = asyncio.create_task(self._edit_loop())
+
+    async def _edit_loop(self):
+        while self.message and self._pending != self._shown:
+            delay = max(self._last_edit + self.min_interval - time.monotonic(), chat_ready_in(self.chat_id))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            text = self._pending
+            try:
+                await call_api(
+                    "edit_message_text", self.context.bot.edit_message_text,
+                    chat_id=self.chat_id,
+                    message_id=self.message.message_id,
+                    text=text
+                )
+            except Exception as e:
+                # Progress is best effort; the next status gets another try
+                logger.warning(f"Progress edit failed: {str(e)}")
+            self._shown = text
+            self._last_edit = time.monotonic()
+
+    async def update_status(self, percentage, *keys, **kwargs):
+        """Update progress with a status composed from language keys"""
+        status_message = "".join(self.lang[key].format(**kwargs) for key in keys)
+        await self.update(percentage, status_message)
+
+    async def stream(self, text):
+        """Show partially generated output in a progressively edited reply"""
+        if self.streaming is None:
+            self.streaming = StreamingMessage(self.context, self.chat_id)
+        await self.streaming.push(text)
+
+    async def finish_stream(self, text):
+        """Put the final text into the streamed reply; return False if it must be sent separately"""
+        if self.streaming is None:
+            return False
+        try:
+            return await self.streaming.finish(text)
+        except BadRequest as e:
+            logger.warning(f"Final streamed edit rejected: {str(e)}")
+            if self.streaming.message:
+                await call_api(
+                    "delete_message", self.context.bot.delete_message,
+                    chat_id=self.chat_id,
+                    message_id=self.streaming.message.message_id
+                )
+                self.streaming.message = None
+            return False
+
     async def complete(self):
         """Mark as complete and delete the progress message"""
+        if self._edit_task and not self._edit_task.done():
+            self._edit_task.cancel()
+            PROGRESS_EDITS_SKIPPED.inc()
         if self.message:
-            await self.message.delete()
-            self.message = None
-    
+            message, self.message = self.message, None
+            try:
+                await call_api(
+                    "delete_message", self.context.bot.delete_message,
+                    chat_id=self.chat_id,
+                    message_id=message.message_id
+                )
+            except BadRequest as e:
+                logger.warning(f"Progress message could not be deleted: {str(e)}")
+
     def _format_progress_message(self, percentage, status_message):
         """Format the progress message with emojis and percentage"""
         filled = int(percentage / 20)  # 5 blocks for 100%
         empty = 5 - filled
-        
+
         progress_blocks = "🟩" * filled + "⬜️" * empty
-        return f"{progress_blocks} {percentage}%\n{status_message}"
\ No newline at end of file
+        return f"{progress_blocks} {percentage}%\n{status_message}"
+
+
+class BatchProgress:
+    """Aggregate the progress of several videos into one ProgressTracker message"""
+    def __init__(self, tracker, total, span=90):
+        self.tracker = tracker
+        self.total = total
+        self.span = span  # overall percentage reached when every video is done
+        self.done = 0
+        self._percentages = [0] * total
+        self._shown = None
+        self._lock = asyncio.Lock()
+
+    def reporter(self, index):
+        """Return a progress object for one video of the batch"""
+        return _BatchItemProgress(self, index)
+
+    async def set_percentage(self, index, percentage):
+        self._percentages[index] = max(self._percentages[index], percentage)
+        await self._refresh()
+
+    async def mark_done(self, index):
+        self._percentages[index] = 100
+        self.done += 1
+        await self._refresh()
+
+    async def _refresh(self):
+        async with self._lock:
+            # Round to 5% so concurrent videos do not trigger an edit on every small step
+            percentage = sum(self._percentages) * self.span // (100 * self.total) // 5 * 5
+            shown = (percentage, self.done)
+            if shown == self._shown:
+                return
+            self._shown = shown
+            await self.tracker.update_status(percentage, "batch_progress", done=self.done, total=self.total)
+
+
+class _BatchItemProgress:
+    """Progress reporter for one video of a batch; partial output is not streamed"""
+    def __init__(self, batch, index):
+        self.batch = batch
+        self.index = index
+
+    async def update_status(self, percentage, *keys, **kwargs):
+        await self.batch.set_percentage(self.index, percentage)
+
+    async def stream(self, text):
+        pass
@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import signal
+
+from telegram import Bot
+
+from app.config import BOT_TOKEN, JOB_POLL_INTERVAL, LLM_PRELOAD, WORKER_JOBS
+from app.database.models import init_db
+from app.services.executor import run_blocking, shutdown_executor
+from app.services.job_store import job_store
+from app.services.llm_router import preload_litellm
+from app.services.proxy_pool import proxy_pool
+from app.telegram.jobs import run_queued_job
+from app.translations import translations
+
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """
+    Worker process of a split deployment: claims note jobs that front
+    processes queued in the jobs table, makes the notes and sends them.
+    Any number of workers can share one database; each runs up to
+    concurrency jobs at a time and keeps their leases alive, so the jobs of
+    a worker that dies are picked up by another one.
+    """
+    def __init__(self, bot=None, concurrency=WORKER_JOBS, poll_interval=JOB_POLL_INTERVAL):
+        self.bot = bot or Bot(BOT_TOKEN)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.name = f"worker-{os.getpid()}"
+        self._tasks = {}  # job ID -> task running it
+        self._wakeup = None
+        self._stopping = False
+
+    async def run(self):
+        """Claim and run jobs until stop() is called"""
+        self._wakeup = asyncio.Event()
+        await run_blocking("db", init_db)
+        if LLM_PRELOAD:
+            preload_litellm()
+        await proxy_pool.start()
+        translations.start_watching()
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            await run_blocking("db", job_store.prune)
+            async with self.bot:
+                logger.info(f"{self.name} started, running up to {self.concurrency} jobs at once")
+                while not self._stopping:
+                    if len(self._tasks) < self.concurrency and await self._claim():
+                        continue
+                    # Wait for a free slot, new work or stop()
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                await self._release()
+        finally:
+            heartbeat.cancel()
+            translations.stop_watching()
+            await proxy_pool.stop()
+            shutdown_executor(wait=False)
+            logger.info(f"{self.name} stopped")
+
+    def stop(self):
+        """Stop claiming jobs; the running ones are put back in the queue"""
+        self._stopping = True
+        if self._wakeup:
+            self._wakeup.set()
+
+    def run_forever(self):
+        """Run until SIGINT or SIGTERM"""
+        async def main():
+            loop = asyncio.get_running_loop()
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(sig, self.stop)
+            await self.run()
+        asyncio.run(main())
+
+    async def _claim(self):
+        """Start the next queued job; return False if there is none"""
+        try:
+            job = await job_store.aclaim()
+        except Exception as e:
+            logger.warning(f"{self.name} could not claim a job: {str(e)}")
+            return False
+        if job is None:
+            return False
+        logger.info(f"{self.name} claimed job {job.id} ({job.video_id}) for chat {job.chat_id}")
+        task = asyncio.create_task(run_queued_job(self.bot, job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._finished(job.id))
+        return True
+
+    def _finished(self, job_id):
+        self._tasks.pop(job_id, None)
+        self._wakeup.set()
+
+    async def _heartbeat(self):
+        """Renew the leases of running jobs well before they expire"""
+        interval = job_store.lease.total_seconds() / 3
+        while True:
+            await asyncio.sleep(interval)
+            await job_store.aheartbeat(list(self._tasks))
+
+    async def _release(self):
+        """Cancel the running jobs and requeue them for another worker"""
+        if not self._tasks:
+            return
+        job_ids = list(self._tasks)
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        try:
+            requeued = await run_blocking("db", job_store.release, job_ids)
+            logger.info(f"{self.name} requeued {requeued} running jobs")
+        except Exception as e:
+            logger.warning(f"{self.name} could not requeue its jobs; they are retried once their lease expires: {str(e)}")
+
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import logging
+from types import MappingProxyType
+
+from app.config import LANG_DIR, DEFAULT_LANGUAGE, LANG_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class TranslationRegistry:
+    """
+    Every language file in a directory, loaded once into read-only tables.
+    Keys missing from a language fall back to the default language.
+    """
+    def __init__(self, lang_dir, default=DEFAULT_LANGUAGE):
+        self.lang_dir = lang_dir
+        self.default = default
+        self._tables = MappingProxyType({})
+        self._mtimes = {}
+        self._watch_task = None
+        self.load()
+
+    def _scan(self):
+        """Return {language code: modification time} for the language files"""
+        return {path.stem: path.stat().st_mtime for path in sorted(self.lang_dir.glob("*.json"))}
+
+    def load(self):
+        """Load all language files and atomically swap in the new tables"""
+        mtimes = self._scan()
+        raw = {}
+        for code in mtimes:
+            try:
+                with open(self.lang_dir / f"{code}.json", "r", encoding="utf-8") as f:
+                    raw[code] = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Skipping language file {code}.json: {str(e)}")
+                # Keep serving the previously loaded table for this language
+                if code in self._tables:
+                    raw[code] = dict(self._tables[code])
+
+        fallback = raw.get(self.default, {})
+        self._tables = MappingProxyType({
+            code: MappingProxyType({**fallback, **strings})
+            for code, strings in raw.items()
+        })
+        self._mtimes = mtimes
+
+    def reload_if_changed(self):
+        """Reload when a language file was added, removed or modified"""
+        if self._scan() != self._mtimes:
+            self.load()
+            return True
+        return False
+
+    def get(self, lang_code=None):
+        """Get the table for a language, or the default language's table"""
+        table = self._tables.get(lang_code) or self._tables.get(self.default)
+        return table if table is not None else MappingProxyType({})
+
+    def codes(self):
+        """Available language codes"""
+        return tuple(self._tables.keys())
+
+    def is_available(self, lang_code):
+        return lang_code in self._tables
+
+    def start_watching(self, interval=LANG_RELOAD_INTERVAL):
+        """Poll language files for changes in the background"""
+        if self._watch_task is None and interval > 0:
+            self._watch_task = asyncio.create_task(self._watch(interval))
+
+    def stop_watching(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _watch(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if self.reload_if_changed():
+                    logger.info("Language files reloaded")
+            except Exception as e:
+                logger.warning(f"Language reload failed: {str(e)}")
+
+
+translations = TranslationRegistry(LANG_DIR)
+
+
+def load_language(lang_code="en"):
+    """Get the translation table for a language, falling back to English"""
+    return translations.get(lang_code)
@@ -0,0 +1,162 @@
+"""
+Benchmark transcript compaction over a corpus of sample transcripts.
+
+By default the corpus is synthetic: auto-generated captions (rolling lines
+that repeat the end of the previous one, [Music] markers, fillers, uneven
+whitespace) and clean manual captions, at several video lengths. Point
+--corpus at a directory of real transcripts instead: .json files holding a
+list of {"text", "start", "duration"} segments (youtube-transcript-api's
+raw data) or .txt files with one caption line per line. They are treated as
+auto-generated captions unless --manual is given.
+
+Reports size in characters and tokens before and after compaction, the time
+compaction takes, and the LLM input time it saves at a given prefill rate.
+
+    python benchmarks/bench_compaction.py
+    python benchmarks/bench_compaction.py --corpus ~/transcripts --model gpt-4o
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import stubs  # noqa: F401  (must come before any app import)
+from stubs import SAMPLE_SENTENCES, percentile
+
+from app.services.compaction import compact_transcript, count_tokens, prepare_transcript
+from app.services.transcript import Transcript
+
+MARKERS = ["[Music]", "[Applause]", "[Laughter]", "♪♪♪"]
+FILLERS = ["um", "uh", "um,", "uh,", "hmm"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of .json or .txt transcripts (default: synthetic)")
+    parser.add_argument("--manual", action="store_true", help="the corpus holds manual captions")
+    parser.add_argument("--minutes", default="5,20,60", help="synthetic video lengths in minutes")
+    parser.add_argument("--videos", type=int, default=5, help="synthetic videos per length and kind")
+    parser.add_argument("--model", default="gemini/gemini-2.0-flash", help="model whose tokenizer is used")
+    parser.add_argument("--budget", type=int, default=0,
+                        help="token budget; like the bot, not applied past CHUNKING_THRESHOLD_CHARS (0: none)")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=4000.0,
+                        help="LLM input processing rate used to estimate time saved")
+    return parser.parse_args()
+
+
+def synthetic_auto(minutes):
+    """Rolling auto-captions: every line repeats the tail of the previous one"""
+    transcript = Transcript("en", is_generated=True)
+    words = []
+    start = 0.0
+    while start < minutes * 60:
+        if random.random() < 0.03:
+            transcript.append(start, 4.0, random.choice(MARKERS))
+            start += 4.0
+            continue
+        sentence = random.choice(SAMPLE_SENTENCES).split()
+        if random.random() < 0.3:
+            sentence.insert(random.randrange(len(sentence)), random.choice(FILLERS))
+        words.extend(sentence)
+        while len(words) >= 8:
+            tail = words[:4]
+            line = tail + words[4:8]
+            spacing = "  " if random.random() < 0.2 else " "
+            transcript.append(start, 3.2, spacing.join(line))
+            start += 1.6
+            # The next line starts with the second half of this one
+            words = words[4:]
+    return transcript
+
+
+def synthetic_manual(minutes):
+    """Clean, human-made captions: one sentence per segment"""
+    transcript = Transcript("en")
+    start = 0.0
+    sentence = None
+    while start < minutes * 60:
+        sentence = random.choice([s for s in SAMPLE_SENTENCES if s != sentence])
+        transcript.append(start, 3.0, sentence + ".")
+        start += 3.0
+    return transcript
+
+
+def load_corpus(directory, is_generated=True):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(".json"):
+            with open(path, encoding="utf-8") as f:
+                segments = json.load(f)
+            transcript = Transcript("und", is_generated)
+            for segment in segments:
+                transcript.append(segment["start"], segment["duration"], segment["text"])
+        elif name.endswith(".txt"):
+            with open(path, encoding="utf-8") as f:
+                transcript = Transcript("und", is_generated)
+                for number, line in enumerate(f):
+                    transcript.append(number * 3.0, 3.0, line.strip())
+        else:
+            continue
+        corpus.append((name, transcript))
+    return corpus
+
+
+def build_corpus(args):
+    if args.corpus:
+        return [(name, [transcript]) for name, transcript in load_corpus(os.path.expanduser(args.corpus), not args.manual)]
+    random.seed(7)
+    corpus = []
+    for minutes in [int(m) for m in args.minutes.split(",")]:
+        for kind, make in (("auto", synthetic_auto), ("manual", synthetic_manual)):
+            corpus.append((f"{kind} {minutes} min", [make(minutes) for _ in range(args.videos)]))
+    return corpus
+
+
+def measure(transcripts, args):
+    raw_chars = compacted_chars = raw_tokens = sent_tokens = 0
+    timings = []
+    for transcript in transcripts:
+        started = time.perf_counter()
+        compacted, raw, _, tokens = prepare_transcript(transcript, args.model, args.budget)
+        timings.append(time.perf_counter() - started)
+        raw_chars += len(transcript.text)
+        compacted_chars += len(compacted.text)
+        raw_tokens += raw
+        sent_tokens += tokens
+    count = len(transcripts)
+    return {
+        "chars": (raw_chars / count, compacted_chars / count),
+        "tokens": (raw_tokens / count, sent_tokens / count),
+        "p50 ms": percentile(timings, 0.50) * 1000,
+        "saved s": (raw_tokens - sent_tokens) / count / args.prefill_tokens_per_second,
+    }
+
+
+def main():
+    args = parse_args()
+    corpus = build_corpus(args)
+    # Load the tokenizer before timing anything
+    count_tokens("warm up", args.model)
+    compact_transcript(Transcript("en"))
+
+    header = (f"{'corpus':<16} {'chars':>8} {'compact':>8} {'tokens':>8} {'sent':>8} "
+              f"{'saved':>6} {'prep ms':>8} {'LLM s saved':>11}")
+    print(header)
+    print("-" * len(header))
+    total_raw = total_sent = 0
+    for name, transcripts in corpus:
+        r = measure(transcripts, args)
+        raw_tokens, sent_tokens = r["tokens"]
+        total_raw += raw_tokens * len(transcripts)
+        total_sent += sent_tokens * len(transcripts)
+        saved = 1 - sent_tokens / raw_tokens if raw_tokens else 0.0
+        print(f"{name[:16]:<16} {r['chars'][0]:>8.0f} {r['chars'][1]:>8.0f} {raw_tokens:>8.0f} "
+              f"{sent_tokens:>8.0f} {saved:>6.0%} {r['p50 ms']:>8.1f} {r['saved s']:>11.2f}")
+    if total_raw:
+        print(f"\nTokens sent overall: {total_sent:.0f} of {total_raw:.0f} ({1 - total_sent / total_raw:.0%} saved)")
+
+
+if __name__ == "__main__":
+    main()
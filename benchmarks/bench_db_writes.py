@@ -0,0 +1,99 @@
+"""
+Benchmark concurrent message-history writes against the bot database.
+
+Starts N worker threads that each store messages through MessageRepository
+for a fixed duration, the way handlers do from the worker pool, and reports
+write throughput, per-write latency and lock errors.
+
+    python benchmarks/bench_db_writes.py
+    python benchmarks/bench_db_writes.py --threads 1,8,32 --journal-mode DELETE
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", default="1,4,16,32", help="comma-separated writer thread counts")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per level")
+    parser.add_argument("--journal-mode", default="WAL", help="SQLite journal mode (WAL, DELETE, ...)")
+    return parser.parse_args()
+
+
+args = parse_args()
+# The engine reads its settings at import time
+os.environ["SQLITE_JOURNAL_MODE"] = args.journal_mode
+
+import stubs  # noqa: E402,F401  (must come before any app import)
+from stubs import percentile  # noqa: E402
+
+from app.database.models import get_db, init_db  # noqa: E402
+from app.database.repository import MessageRepository, UserRepository  # noqa: E402
+
+CHAT_ID = 424242
+
+
+def run_level(threads, duration):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def writer(number):
+        nonlocal errors
+        local = []
+        local_errors = 0
+        message_id = number * 10 ** 7
+        while time.perf_counter() < deadline:
+            message_id += 1
+            started = time.perf_counter()
+            try:
+                with get_db() as db:
+                    MessageRepository.create_message(db, message_id, CHAT_ID, "https://youtu.be/dQw4w9WgXcQ")
+            except Exception:
+                local_errors += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    workers = [threading.Thread(target=writer, args=(number,)) for number in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "threads": threads,
+        "writes": len(latencies),
+        "errors": errors,
+        "wps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def main():
+    init_db()
+    with get_db() as db:
+        if not UserRepository.get_user(db, CHAT_ID):
+            UserRepository.create_user(db, CHAT_ID, "writer", is_active=True)
+
+    print(f"journal mode: {args.journal_mode}")
+    header = f"{'threads':>8} {'writes':>8} {'errors':>7} {'writes/s':>10} {'p50 ms':>8} {'p99 ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for threads in (int(value) for value in args.threads.split(",")):
+        r = run_level(threads, args.duration)
+        print(f"{r['threads']:>8} {r['writes']:>8} {r['errors']:>7} {r['wps']:>10.1f} "
+              f"{r['p50'] * 1000:>8.2f} {r['p99'] * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
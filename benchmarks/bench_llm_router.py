@@ -0,0 +1,132 @@
+"""
+Benchmark the LLM router against local fake provider endpoints.
+
+Starts three OpenAI-compatible fake servers standing in for Gemini, OpenAI
+and Anthropic (the primary one has occasional very slow responses and
+errors), then sends the same load through routers with a single provider,
+with failover, and with failover plus hedging, and reports latency
+percentiles, failures, which provider answered and the share of prompt
+tokens served from the providers' prompt caches.
+
+    python benchmarks/bench_llm_router.py
+    python benchmarks/bench_llm_router.py --requests 200 --concurrency 20 --hedge-after 2
+"""
+import argparse
+import asyncio
+import time
+import warnings
+
+import stubs  # noqa: F401  (must come before any app import)
+from stubs import percentile
+from fake_llm_server import FakeLLMServer
+
+from app.config import DEFAULT_PROMPT_TEMPLATE
+from app.metrics import LLM_TOKENS
+from app.services.llm_router import LLMProvider, LLMRouter
+from app.services.llm_service import split_prompt
+
+# litellm warns about response serialization for OpenAI-compatible fakes
+warnings.filterwarnings("ignore")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight at once")
+    parser.add_argument("--latency", type=float, default=0.5, help="mean latency of the primary provider (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="fraction of very slow primary responses")
+    parser.add_argument("--failure-rate", type=float, default=0.1, help="fraction of failed primary responses")
+    parser.add_argument("--timeout", type=float, default=8.0, help="per-provider timeout (s)")
+    parser.add_argument("--hedge-after", type=float, default=1.5, help="hedging delay (s)")
+    parser.add_argument("--stream", action="store_true", help="stream responses")
+    return parser.parse_args()
+
+
+def prompt_tokens():
+    """Return (prompt, cached) token totals recorded so far"""
+    totals = {"prompt": 0, "cached": 0}
+    for labels, value in LLM_TOKENS.items():
+        if labels["kind"] in totals:
+            totals[labels["kind"]] += value
+    return totals["prompt"], totals["cached"]
+
+
+def make_providers(servers, names):
+    return [
+        LLMProvider(name, f"openai/fake-{name.lower()}", "fake-key", servers[name].api_base)
+        for name in names
+    ]
+
+
+async def run_scenario(router, args):
+    latencies = []
+    failures = 0
+    answered = {}
+    prompt_before, cached_before = prompt_tokens()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def ignore_partial(text):
+        pass
+
+    async def one_request(number):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            system, user = split_prompt(DEFAULT_PROMPT_TEMPLATE, transcript=f"Transcript number {number}")
+            try:
+                _, model = await router.complete(
+                    user,
+                    on_partial=ignore_partial if args.stream else None,
+                    system=system
+                )
+                answered[model] = answered.get(model, 0) + 1
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one_request(number) for number in range(args.requests)))
+    elapsed = time.perf_counter() - started
+    prompt_after, cached_after = prompt_tokens()
+    return {
+        "rps": len(latencies) / elapsed,
+        "failures": failures,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "answered": answered,
+        "cached": (cached_after - cached_before) / max(1, prompt_after - prompt_before),
+    }
+
+
+async def main():
+    args = parse_args()
+    servers = {
+        "GEMINI": FakeLLMServer(latency=args.latency, failure_rate=args.failure_rate,
+                                slow_rate=args.slow_rate, slow_latency=args.timeout * 2).start(),
+        "OPENAI": FakeLLMServer(latency=args.latency * 1.3, failure_rate=0.02).start(),
+        "ANTHROPIC": FakeLLMServer(latency=args.latency * 1.6, failure_rate=0.02).start(),
+    }
+    scenarios = [
+        ("primary only", LLMRouter(make_providers(servers, ["GEMINI"]), args.timeout, 0)),
+        ("failover", LLMRouter(make_providers(servers, ["GEMINI", "OPENAI", "ANTHROPIC"]), args.timeout, 0)),
+        ("failover + hedge", LLMRouter(make_providers(servers, ["GEMINI", "OPENAI", "ANTHROPIC"]),
+                                       args.timeout, args.hedge_after)),
+    ]
+
+    header = (f"{'scenario':<18} {'req/s':>7} {'fail':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} "
+              f"{'cached':>7}  answered by")
+    print(header)
+    print("-" * len(header))
+    for name, router in scenarios:
+        r = await run_scenario(router, args)
+        answered = ", ".join(f"{model.split('-')[-1]}={count}" for model, count in sorted(r["answered"].items()))
+        print(f"{name:<18} {r['rps']:>7.2f} {r['failures']:>5} {r['p50']:>7.2f} {r['p95']:>7.2f} "
+              f"{r['p99']:>7.2f} {r['cached']:>7.0%}  {answered}")
+
+    for server in servers.values():
+        server.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
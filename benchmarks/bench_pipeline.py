@@ -0,0 +1,125 @@
+"""
+End-to-end benchmark of the note-taking pipeline against local stand-ins.
+
+Drives process_youtube_url with synthetic Updates from N concurrent users,
+each sending requests back to back, and reports throughput, end-to-end
+latency percentiles, event-loop lag and Telegram API calls per request.
+
+    python benchmarks/bench_pipeline.py
+    python benchmarks/bench_pipeline.py --users 1,10,100 --requests 5 --fetch-latency 0.5
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import stubs  # noqa: F401  (must come before any app import)
+from stubs import (
+    FakeBot, FakeLLM, FakeTranscriptBackend, LoopLagMonitor,
+    make_context, make_update, percentile, random_video_id
+)
+
+from app.database.models import get_db, init_db
+from app.database.repository import UserRepository
+from app.services.history_writer import history_writer
+from app.telegram.handlers import process_youtube_url
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="1,10,100", help="comma-separated concurrent user counts")
+    parser.add_argument("--requests", type=int, default=3, help="requests per user")
+    parser.add_argument("--hot-videos", type=int, default=0,
+                        help="pick videos from this many shared IDs (0: every request is a new video)")
+    parser.add_argument("--fetch-latency", type=float, default=0.3, help="mean transcript fetch latency (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="transcript fetch failure rate")
+    parser.add_argument("--transcript-lines", type=int, default=400, help="caption lines per transcript")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="LLM output rate")
+    parser.add_argument("--output-tokens", type=int, default=300, help="LLM output tokens per call")
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="Bot API call latency (s)")
+    parser.add_argument("--flood-interval", type=float, default=0.0,
+                        help="fail Bot API calls to one chat closer together than this with RetryAfter (s)")
+    return parser.parse_args()
+
+
+def ensure_users(chat_ids):
+    """Register active users so requests pass the authorization check"""
+    with get_db() as db:
+        for chat_id in chat_ids:
+            if not UserRepository.get_user(db, chat_id):
+                UserRepository.create_user(db, chat_id, f"user{chat_id}", is_active=True)
+
+
+async def run_level(users, args, bot, hot_videos):
+    chat_ids = [100000 + i for i in range(users)]
+    ensure_users(chat_ids)
+    latencies = []
+    failures = 0
+    update_ids = iter(range(random.randint(1, 10 ** 6), 10 ** 9))
+
+    async def user_session(chat_id):
+        nonlocal failures
+        for _ in range(args.requests):
+            video_id = random.choice(hot_videos) if hot_videos else random_video_id()
+            update = make_update(bot, chat_id, f"https://youtu.be/{video_id}", next(update_ids))
+            started = time.perf_counter()
+            try:
+                await process_youtube_url(update, make_context(bot))
+            except Exception:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    calls_before = bot.total_calls
+    floods_before = bot.flood_errors
+    monitor = LoopLagMonitor()
+    monitor.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(user_session(chat_id) for chat_id in chat_ids))
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+
+    total = len(latencies)
+    return {
+        "users": users,
+        "requests": total,
+        "failures": failures,
+        "rps": total / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "lag_p99": percentile(monitor.samples, 0.99),
+        "lag_max": max(monitor.samples, default=0.0),
+        "api_calls": (bot.total_calls - calls_before) / total if total else 0.0,
+        "floods": (bot.flood_errors - floods_before) / total if total else 0.0,
+    }
+
+
+def print_report(results):
+    header = (f"{'users':>6} {'reqs':>6} {'fail':>5} {'req/s':>8} {'p50 s':>8} {'p95 s':>8} "
+              f"{'p99 s':>8} {'lag p99 ms':>11} {'lag max ms':>11} {'api/req':>8} {'429/req':>8}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['users']:>6} {r['requests']:>6} {r['failures']:>5} {r['rps']:>8.2f} {r['p50']:>8.3f} "
+              f"{r['p95']:>8.3f} {r['p99']:>8.3f} {r['lag_p99'] * 1000:>11.1f} "
+              f"{r['lag_max'] * 1000:>11.1f} {r['api_calls']:>8.1f} {r['floods']:>8.2f}")
+
+
+async def main():
+    args = parse_args()
+    init_db()
+    import litellm  # noqa: F401  (load it now rather than during the first measured note)
+    FakeTranscriptBackend(args.fetch_latency, args.failure_rate, args.transcript_lines).install()
+    FakeLLM(args.tokens_per_second, args.output_tokens).install()
+    bot = FakeBot(args.telegram_latency, args.flood_interval)
+    hot_videos = [random_video_id() for _ in range(args.hot_videos)]
+
+    results = []
+    for users in (int(value) for value in args.users.split(",")):
+        results.append(await run_level(users, args, bot, hot_videos))
+    await history_writer.stop()
+    print_report(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark the bot's cold start.
+
+First breaks down the import of app.telegram.bot with python -X importtime,
+by top-level package, to show what a process pays before it can do
+anything. Then starts fresh processes that import the bot, initialize it
+(post_init, which creates the database tables) and answer a /start through
+the local Bot API stand-in in stubs.py, with LLM_PRELOAD on and off, and
+reports the time from process launch to each step and to litellm being
+ready for the first note.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 5 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+STEPS = ("import", "ready", "first /start", "litellm ready")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts per setting; the median is reported")
+    parser.add_argument("--top", type=int, default=10, help="packages listed in the import breakdown")
+    parser.add_argument("--child", choices=("on", "off"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def import_breakdown(top):
+    """Import app.telegram.bot under -X importtime and sum the self time per top-level package"""
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT, TOKEN_BOT="123456:BENCHMARK", METRICS_PORT="0")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.telegram.bot"],
+        cwd=tempfile.mkdtemp(prefix="notetaker-startup-"), env=env, capture_output=True, text=True, check=True
+    )
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    total = sum(packages.values())
+    print(f"import app.telegram.bot: {total / 1e6:.2f}s")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<24} {self_us / 1e6:>6.2f}s {100 * self_us / total:>5.1f}%")
+    print(f"  litellm imported: {'yes' if 'litellm' in packages else 'no'}")
+
+
+def child(launched):
+    """One cold start: report seconds from process launch to each step"""
+    marks = {}
+    import asyncio
+    import stubs  # noqa: F401  (must come before any app import)
+    from stubs import FakeBot, FakeBotAPI, make_update
+    from app.services import llm_router
+    from app.telegram.bot import TelegramBot
+    marks["import"] = time.time() - launched
+
+    async def main():
+        application = TelegramBot("all", request=FakeBotAPI(FakeBot(latency=0))).application
+        async with application:
+            await application.post_init(application)
+            marks["ready"] = time.time() - launched
+            await application.process_update(make_update(application.bot, 400000, "/start", 1))
+            marks["first /start"] = time.time() - launched
+            # Waits for the background import when LLM_PRELOAD is on
+            llm_router._acompletion()
+            marks["litellm ready"] = time.time() - launched
+        await application.post_shutdown(application)
+
+    asyncio.run(main())
+    print(json.dumps(marks))
+
+
+def cold_start(preload):
+    env = dict(os.environ, LLM_PRELOAD="true" if preload == "on" else "false")
+    launched = time.time()
+    env["STARTUP_LAUNCHED"] = repr(launched)
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", preload],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        child(float(os.environ["STARTUP_LAUNCHED"]))
+        return
+
+    import_breakdown(args.top)
+    print()
+    header = f"{'preload':>7} " + " ".join(f"{step:>14}" for step in STEPS)
+    print(header)
+    print("-" * len(header))
+    for preload in ("off", "on"):
+        runs = [cold_start(preload) for _ in range(args.runs)]
+        print(f"{preload:>7} " + " ".join(
+            f"{statistics.median(run[step] for run in runs):>13.2f}s" for step in STEPS
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Local harness for webhook mode.
+
+Runs the bot's real python-telegram-bot webhook server on 127.0.0.1, with
+the Bot API, YouTube and the LLM replaced by the stand-ins in stubs.py (the
+Bot API through FakeBotAPI, so nothing reaches Telegram), and POSTs
+synthetic updates to it the way Telegram does.
+
+Checks that updates without the secret token or with a wrong one are
+rejected and never handled, and that updates from many chats are handled
+concurrently: reports the time for one update alone and for --updates at
+once, and the resulting concurrency.
+
+    python benchmarks/bench_webhook.py
+    python benchmarks/bench_webhook.py --updates 50 --fetch-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+os.environ.setdefault("WEBHOOK_URL", "https://bench.example.com/telegram")
+os.environ.setdefault("WEBHOOK_SECRET_TOKEN", "bench-secret")
+os.environ.setdefault("WEBHOOK_LISTEN", "127.0.0.1")
+os.environ.setdefault("WEBHOOK_PORT", str(_free_port()))
+
+import httpx  # noqa: E402
+
+import stubs  # noqa: E402,F401  (must come before any app import)
+from stubs import FakeBot, FakeBotAPI, FakeLLM, FakeTranscriptBackend, make_update, random_video_id  # noqa: E402
+from bench_pipeline import ensure_users  # noqa: E402
+
+from app.config import WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET_TOKEN  # noqa: E402
+from app.database.models import init_db  # noqa: E402
+from app.metrics import JOBS  # noqa: E402
+from app.telegram.bot import TelegramBot  # noqa: E402
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20, help="updates, from different chats, posted at once")
+    parser.add_argument("--fetch-latency", type=float, default=0.3, help="mean transcript fetch latency (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="LLM output rate")
+    parser.add_argument("--output-tokens", type=int, default=300, help="LLM output tokens per call")
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="Bot API call latency (s)")
+    return parser.parse_args()
+
+
+def handled():
+    """Updates that got through to the note handler, whatever the outcome"""
+    return sum(value for _, value in JOBS.items())
+
+
+async def wait_handled(count, timeout=120):
+    deadline = time.monotonic() + timeout
+    while handled() < count:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"only {handled()} of {count} updates were handled")
+        await asyncio.sleep(0.01)
+
+
+async def run(args):
+    FakeTranscriptBackend(latency=args.fetch_latency).install()
+    FakeLLM(tokens_per_second=args.tokens_per_second, output_tokens=args.output_tokens).install()
+    fake_bot = FakeBot(latency=args.telegram_latency)
+    chat_ids = [300000 + i for i in range(args.updates + 2)]
+    init_db()
+    ensure_users(chat_ids)
+
+    bot = TelegramBot("all", request=FakeBotAPI(fake_bot))
+    application = bot.application
+    url = f"http://127.0.0.1:{WEBHOOK_PORT}/{WEBHOOK_PATH}"
+    update_ids = iter(range(1, 10 ** 6))
+
+    def payload(chat_id):
+        text = f"https://youtu.be/{random_video_id()}"
+        return make_update(fake_bot, chat_id, text, next(update_ids)).to_dict()
+
+    checks = []
+    async with application:
+        await application.post_init(application)
+        import litellm  # noqa: F401  (load it now rather than during the first measured update)
+        await application.updater.start_webhook(**bot.webhook_options())
+        await application.start()
+        try:
+            async with httpx.AsyncClient(timeout=30) as client:
+                missing = await client.post(url, json=payload(chat_ids[0]))
+                wrong = await client.post(url, json=payload(chat_ids[0]), headers={SECRET_HEADER: "wrong"})
+                checks.append(("no secret token rejected", missing.status_code == 403, missing.status_code))
+                checks.append(("wrong secret token rejected", wrong.status_code == 403, wrong.status_code))
+
+                headers = {SECRET_HEADER: WEBHOOK_SECRET_TOKEN}
+                started = time.perf_counter()
+                single = await client.post(url, json=payload(chat_ids[1]), headers=headers)
+                await wait_handled(1)
+                single_time = time.perf_counter() - started
+                checks.append(("valid update accepted", single.status_code == 200, single.status_code))
+
+                started = time.perf_counter()
+                responses = await asyncio.gather(*[
+                    client.post(url, json=payload(chat_id), headers=headers) for chat_id in chat_ids[2:]
+                ])
+                await wait_handled(1 + args.updates)
+                batch_time = time.perf_counter() - started
+                accepted = sum(response.status_code == 200 for response in responses)
+                checks.append(("concurrent updates accepted", accepted == args.updates, f"{accepted}/{args.updates}"))
+
+            # Give rejected updates a moment to show up, had they been queued
+            await asyncio.sleep(0.5)
+            checks.append(("rejected updates never handled", handled() == 1 + args.updates, handled()))
+        finally:
+            await application.updater.stop()
+            await application.stop()
+    await application.post_shutdown(application)
+
+    concurrency = args.updates * single_time / batch_time
+    checks.append(("updates handled concurrently", concurrency > 2, f"{concurrency:.1f}x"))
+    print(f"one update: {single_time:.2f}s, {args.updates} at once: {batch_time:.2f}s, "
+          f"{fake_bot.calls.get('setWebhook', 0)} setWebhook call(s)")
+    for name, ok, detail in checks:
+        print(f"{'PASS' if ok else 'FAIL'}  {name} ({detail})")
+    return all(ok for _, ok, _ in checks)
+
+
+def main():
+    args = parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark the split deployment: note jobs queued in a shared SQLite
+database and run by 1, 2, 4... worker processes.
+
+Every level starts its worker processes against local stand-ins for YouTube,
+the LLM and Telegram, waits until they are ready, queues the same number of
+jobs from several chats the way a front process does, and measures until
+every job has finished. Reports throughput, queue-to-done latency
+percentiles, and whether any chat got its notes out of order.
+
+Transcript parsing and compaction hold the GIL, so long transcripts
+(--transcript-lines) make one process CPU-bound; more workers then add
+throughput until the cores or the database are saturated.
+
+    python benchmarks/bench_workers.py
+    python benchmarks/bench_workers.py --workers 1,2,4,8 --jobs 400 --transcript-lines 4000
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from datetime import datetime
+
+# Workers are separate processes; they share this database through the environment
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='notetaker-workers-'), 'bench.db')}"
+)
+
+import stubs  # noqa: E402,F401  (must come before any app import)
+from stubs import FakeBot, FakeLLM, FakeTranscriptBackend, percentile, random_video_id  # noqa: E402
+
+from app.database.models import Job, get_db, init_db  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker process counts")
+    parser.add_argument("--jobs", type=int, default=120, help="jobs queued per level")
+    parser.add_argument("--chats", type=int, default=40, help="chats the jobs come from")
+    parser.add_argument("--worker-jobs", type=int, default=8, help="jobs one worker runs at once")
+    parser.add_argument("--fetch-latency", type=float, default=0.3, help="mean transcript fetch latency (s)")
+    parser.add_argument("--transcript-lines", type=int, default=400, help="caption lines per transcript")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="LLM output rate")
+    parser.add_argument("--output-tokens", type=int, default=300, help="LLM output tokens per call")
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="Bot API call latency (s)")
+    return parser.parse_args()
+
+
+def worker_main(args, ready):
+    """A worker process running against the local stand-ins"""
+    import litellm  # noqa: F401  (load it now rather than during the first measured jobs)
+    from app.telegram.worker import JobWorker
+    FakeTranscriptBackend(latency=args.fetch_latency, lines=args.transcript_lines).install()
+    FakeLLM(tokens_per_second=args.tokens_per_second, output_tokens=args.output_tokens).install()
+    worker = JobWorker(bot=FakeBot(latency=args.telegram_latency), concurrency=args.worker_jobs, poll_interval=0.05)
+    ready.set()
+    worker.run_forever()
+
+
+def queue_jobs(args):
+    """Queue jobs round-robin over the chats, in one transaction, like a busy front process"""
+    with get_db() as db:
+        db.query(Job).delete()
+        now = datetime.utcnow()
+        for number in range(args.jobs):
+            db.add(Job(
+                chat_id=200000 + number % args.chats,
+                video_id=random_video_id(),
+                language="en",
+                state="queued",
+                attempts=1,
+                created_at=now,
+                updated_at=now
+            ))
+        db.commit()
+
+
+def finished_jobs():
+    with get_db() as db:
+        return db.query(Job).filter(Job.state.in_(("done", "failed"))).all()
+
+
+def run_level(count, args):
+    context = multiprocessing.get_context("spawn")
+    readies = [context.Event() for _ in range(count)]
+    workers = [context.Process(target=worker_main, args=(args, ready), daemon=True) for ready in readies]
+    for worker in workers:
+        worker.start()
+    for ready in readies:
+        ready.wait()
+
+    queue_jobs(args)
+    started = time.perf_counter()
+    while True:
+        jobs = finished_jobs()
+        if len(jobs) >= args.jobs:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join(timeout=30)
+
+    latencies = [(job.updated_at - job.created_at).total_seconds() for job in jobs]
+    # Every chat must get its notes in the order its jobs were queued
+    out_of_order = 0
+    last_finished = {}
+    for job in sorted(jobs, key=lambda job: job.id):
+        if job.updated_at < last_finished.get(job.chat_id, job.updated_at):
+            out_of_order += 1
+        last_finished[job.chat_id] = job.updated_at
+    return {
+        "rps": args.jobs / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "failed": sum(job.state == "failed" for job in jobs),
+        "out_of_order": out_of_order,
+    }
+
+
+def main():
+    args = parse_args()
+    init_db()
+    header = f"{'workers':>7} {'jobs/s':>7} {'speedup':>7} {'p50 s':>7} {'p95 s':>7} {'failed':>6} {'order':>6}"
+    print(header)
+    print("-" * len(header))
+    baseline = None
+    for count in [int(c) for c in args.workers.split(",")]:
+        r = run_level(count, args)
+        baseline = baseline or r["rps"]
+        print(f"{count:>7} {r['rps']:>7.2f} {r['rps'] / baseline:>6.2f}x {r['p50']:>7.2f} {r['p95']:>7.2f} "
+              f"{r['failed']:>6} {'ok' if not r['out_of_order'] else r['out_of_order']:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+A local OpenAI-compatible chat completions endpoint with configurable
+latency and failure rate, for exercising the LLM router without network
+access or API keys. Like OpenAI's automatic prompt caching, a system
+message it has seen before is reported as cached prompt tokens.
+
+Point any provider at it with an ``openai/`` model prefix, e.g.
+
+    python benchmarks/fake_llm_server.py --port 8901 --latency 2 --failure-rate 0.2
+    GEMINI_MODEL=openai/fake-gemini GEMINI_API_BASE=http://127.0.0.1:8901/v1 python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+NOTE = (
+    "📌 <b>Overview</b>\n- How memory works and why spacing helps.\n\n"
+    "📝 <b>Key Insights</b>\n- <b>Recall:</b> remembering rebuilds the memory.\n\n"
+    "✏️ <b>Summary</b>\n- Review right before you forget."
+)
+
+
+def _text(content):
+    """Text of a message's content, given as a string or a list of content blocks"""
+    if isinstance(content, list):
+        return "".join(block.get("text", "") for block in content)
+    return str(content or "")
+
+
+class _QuietServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients hang up on purpose when a request times out or loses a hedge race
+        pass
+
+
+class FakeLLMServer:
+    """Serve /v1/chat/completions from a background thread"""
+    def __init__(self, port=0, latency=1.0, jitter=0.5, failure_rate=0.0, slow_rate=0.0, slow_latency=10.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.requests = 0
+        self._seen_prefixes = set()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.requests += 1
+                delay = server.slow_latency if random.random() < server.slow_rate else server.latency
+                time.sleep(max(0.0, delay * random.uniform(1 - server.jitter, 1 + server.jitter)))
+                if random.random() < server.failure_rate:
+                    self._send_json(503, {"error": {"message": "Simulated overload", "type": "server_error"}})
+                    return
+                messages = body.get("messages", [])
+                prompt_tokens = sum(len(_text(m.get("content"))) for m in messages) // 4
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(NOTE) // 4,
+                         "total_tokens": prompt_tokens + len(NOTE) // 4}
+                system = "".join(_text(m.get("content")) for m in messages if m.get("role") == "system")
+                if system in server._seen_prefixes:
+                    usage["prompt_tokens_details"] = {"cached_tokens": len(system) // 4}
+                elif system:
+                    server._seen_prefixes.add(system)
+                if body.get("stream"):
+                    self._send_stream(body.get("model", "fake"), usage)
+                else:
+                    self._send_json(200, {
+                        "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                        "model": body.get("model", "fake"),
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": NOTE}}],
+                        "usage": usage,
+                    })
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, model, usage):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": model}
+                for word in NOTE.split(" "):
+                    chunk = dict(base, choices=[{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(0.005)
+                final = dict(base, choices=[], usage=usage)
+                self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.close_connection = True
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _QuietServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    @property
+    def api_base(self):
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=1.0, help="mean response time (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that take --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=10.0)
+    args = parser.parse_args()
+    server = FakeLLMServer(args.port, args.latency, failure_rate=args.failure_rate,
+                           slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    print(f"Fake LLM endpoint at {server.api_base}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
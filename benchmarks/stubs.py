@@ -0,0 +1,303 @@
+"""
+Local stand-ins for the external services the bot talks to.
+
+Importing this module configures the environment for an offline run, so it
+must be imported before anything from ``app``:
+
+- the process moves into a temporary directory, so the SQLite database and
+  caches start empty (unless DATABASE_URL points elsewhere, as it does for
+  worker processes sharing one database)
+- the transcript fetch, the litellm completion and the Telegram Bot API are
+  replaced by local fakes with configurable latency and failure rate
+"""
+import asyncio
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+WORK_DIR = tempfile.mkdtemp(prefix="notetaker-bench-")
+os.chdir(WORK_DIR)
+
+os.environ.setdefault("TOKEN_BOT", "123456:BENCHMARK")
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ.setdefault("METRICS_PORT", "0")
+os.environ.setdefault("LANG_RELOAD_INTERVAL", "0")
+os.environ.setdefault("PROXY_LIST", ",".join(f"http://127.0.0.1:{9000 + i}" for i in range(10)))
+
+from telegram import Chat, Message, MessageEntity, Update, User  # noqa: E402
+from telegram.error import RetryAfter  # noqa: E402
+from telegram.request import BaseRequest  # noqa: E402
+
+SAMPLE_SENTENCES = [
+    "Today we are going to talk about how memory works in the brain",
+    "the first thing to understand is that recall is a reconstruction",
+    "so every time you remember something you are rebuilding it",
+    "which is why spaced repetition is so effective for learning",
+    "let me show you an example with a deck of flash cards",
+    "if you review a card right before you forget it the memory gets stronger",
+    "researchers measured this in a study with over two thousand students",
+    "and the group that used spacing scored thirty percent higher",
+]
+
+
+def random_video_id():
+    """A random 11-character YouTube-style video ID"""
+    return "".join(random.choices(string.ascii_letters + string.digits + "-_", k=11))
+
+
+def make_transcript(lines=400):
+    """A synthetic transcript with one caption segment per line"""
+    return "\n".join(random.choice(SAMPLE_SENTENCES) for _ in range(lines))
+
+
+class FakeTranscriptBackend:
+    """Stand-in for YouTubeService._fetch_transcript with latency and failures"""
+    def __init__(self, latency=0.3, failure_rate=0.0, lines=400):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.lines = lines
+        self.calls = 0
+
+    def fetch(self, video_id, proxy=None, language=None):
+        # Blocking, like the real fetch, so it exercises the worker pool
+        from app.services.transcript import Transcript
+        self.calls += 1
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if random.random() < self.failure_rate:
+            raise Exception("Simulated YouTube block")
+        transcript = Transcript("en", is_generated=True, available_languages=["en"])
+        for number, line in enumerate(make_transcript(self.lines).splitlines()):
+            transcript.append(number * 3.0, 3.0, line)
+        return transcript
+
+    def install(self):
+        from app.services.youtube_service import YouTubeService
+        YouTubeService._fetch_transcript = staticmethod(self.fetch)
+        return self
+
+
+class FakeLLM:
+    """Stand-in for litellm.acompletion that emits tokens at a fixed rate"""
+    NOTE = (
+        "📌 <b>Overview</b>\n- How memory works and why spacing helps.\n\n"
+        "📝 <b>Key Insights</b>\n- <b>Recall:</b> remembering rebuilds the memory.\n\n"
+        "✏️ <b>Summary</b>\n- Review right before you forget."
+    )
+
+    def __init__(self, tokens_per_second=200.0, output_tokens=300, first_token_latency=0.3):
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.first_token_latency = first_token_latency
+        self.calls = 0
+
+    def _tokens(self):
+        words = (self.NOTE + " ") * (self.output_tokens // len(self.NOTE.split()) + 1)
+        return [word + " " for word in words.split(" ")[:self.output_tokens]]
+
+    async def acompletion(self, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        prompt_chars = sum(len(str(message.get("content", ""))) for message in messages)
+        usage = SimpleNamespace(prompt_tokens=prompt_chars // 4, completion_tokens=self.output_tokens)
+        await asyncio.sleep(self.first_token_latency)
+        if stream:
+            return self._stream(usage)
+        await asyncio.sleep(self.output_tokens / self.tokens_per_second)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="".join(self._tokens())))],
+            usage=usage
+        )
+
+    async def _stream(self, usage):
+        delay = 1 / self.tokens_per_second
+        for token in self._tokens():
+            await asyncio.sleep(delay)
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=token))],
+                usage=None
+            )
+        yield SimpleNamespace(choices=[], usage=usage)
+
+    def install(self):
+        import app.services.llm_router as llm_router
+        llm_router.acompletion = self.acompletion
+        return self
+
+
+class FakeBot:
+    """
+    Stand-in for the Telegram Bot API that records every call.
+    With flood_interval set, calls to one chat closer together than that
+    fail with RetryAfter, like Telegram's per-chat flood control.
+    """
+    def __init__(self, latency=0.02, flood_interval=0.0):
+        self.latency = latency
+        self.flood_interval = flood_interval
+        self.calls = {}
+        self.flood_errors = 0
+        self._last_call = {}
+        self._next_message_id = 1
+        self._me = User(id=1, first_name="Bench", is_bot=True, username="bench_bot")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+    async def _call(self, method, chat_id=None):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        await asyncio.sleep(self.latency)
+        if self.flood_interval and chat_id is not None:
+            now = time.monotonic()
+            last = self._last_call.get(chat_id)
+            if last is not None and now - last < self.flood_interval:
+                self.flood_errors += 1
+                raise RetryAfter(1)
+            self._last_call[chat_id] = now
+
+    def _message(self, chat_id, text):
+        self._next_message_id += 1
+        message = Message(
+            message_id=self._next_message_id,
+            date=datetime.utcnow(),
+            chat=Chat(id=chat_id, type=Chat.PRIVATE),
+            from_user=self._me,
+            text=text
+        )
+        message.set_bot(self)
+        return message
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._call("send_message", chat_id)
+        return self._message(chat_id, text)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        await self._call("edit_message_text", chat_id)
+        return True
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        await self._call("delete_message", chat_id)
+        return True
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+
+class FakeBotAPI(BaseRequest):
+    """
+    Bot API transport for a real telegram.Bot or Application that answers
+    locally through a FakeBot, so the whole python-telegram-bot stack (and
+    its webhook server) runs without reaching Telegram.
+    """
+    def __init__(self, fake_bot=None):
+        self.fake_bot = fake_bot or FakeBot()
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        name = url.rsplit("/", 1)[-1]
+        params = request_data.parameters if request_data else {}
+        try:
+            result = await self._answer(name, params)
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if hasattr(retry_after, "total_seconds"):
+                retry_after = retry_after.total_seconds()
+            return 429, json.dumps({
+                "ok": False, "error_code": 429, "description": "Too Many Requests",
+                "parameters": {"retry_after": int(retry_after)}
+            }).encode()
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    async def _answer(self, name, params):
+        fake = self.fake_bot
+        if name == "getMe":
+            return fake._me.to_dict()
+        if name == "sendMessage":
+            return (await fake.send_message(params["chat_id"], params["text"])).to_dict()
+        if name == "editMessageText":
+            return await fake.edit_message_text(params["text"], params.get("chat_id"), params.get("message_id"))
+        if name == "deleteMessage":
+            return await fake.delete_message(params["chat_id"], params["message_id"])
+        # setWebhook, deleteWebhook, answerCallbackQuery...
+        await fake._call(name)
+        return True
+
+
+def make_update(bot, chat_id, text, update_id):
+    """A synthetic Update carrying a text message, or a /command, from a private chat"""
+    user = User(id=chat_id, first_name=f"user{chat_id}", is_bot=False)
+    entities = None
+    if text.startswith("/"):
+        entities = [MessageEntity(MessageEntity.BOT_COMMAND, 0, len(text.split()[0]))]
+    message = Message(
+        message_id=update_id,
+        date=datetime.utcnow(),
+        chat=Chat(id=chat_id, type=Chat.PRIVATE),
+        from_user=user,
+        text=text,
+        entities=entities
+    )
+    message.set_bot(bot)
+    update = Update(update_id=update_id, message=message)
+    update.set_bot(bot)
+    return update
+
+
+def make_context(bot, args=None):
+    """A minimal stand-in for CallbackContext"""
+    return SimpleNamespace(bot=bot, args=args or [])
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up a periodic timer"""
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
@@ -1,20 +1,79 @@
+import argparse
 import logging
+import multiprocessing
+from app.config import BOT_MODE, BOT_ROLE, WEBHOOK_URL, WORKER_PROCESSES
 from app.telegram.bot import TelegramBot
+from app.telegram.worker import JobWorker
 
-def main():
-    """Main function to start the bot"""
-    # Set up logging
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="YouTube Note Taker Telegram bot")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--webhook", dest="mode", action="store_const", const="webhook",
+                      help="receive updates through a webhook server (see WEBHOOK_* settings)")
+    mode.add_argument("--polling", dest="mode", action="store_const", const="polling",
+                      help="receive updates by long polling")
+    parser.add_argument("--role", choices=("all", "front", "worker"), default=BOT_ROLE,
+                        help="all: one process does everything; front: receive updates and queue note jobs; "
+                             "worker: run queued note jobs")
+    parser.add_argument("--workers", type=int, default=WORKER_PROCESSES,
+                        help="worker processes a front process starts itself (default: WORKER_PROCESSES)")
+    parser.set_defaults(mode=BOT_MODE)
+    args = parser.parse_args()
+    if args.mode == "webhook" and args.role != "worker" and not WEBHOOK_URL:
+        parser.error("webhook mode needs WEBHOOK_URL, the public HTTPS URL Telegram sends updates to")
+    return args
+
+def setup_logging():
+    """Configure logging for this process"""
     logging.basicConfig(
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         level=logging.WARNING  # Only WARNING and above will be shown
     )
     # Suppress httpx INFO logs as well
     logging.getLogger("httpx").setLevel(logging.WARNING)
-    
+
+def run_worker():
+    """Run queued note jobs until stopped"""
+    setup_logging()
+    JobWorker().run_forever()
+
+def start_workers(count):
+    """Start worker processes next to this front process"""
+    # Spawned rather than forked, so workers do not inherit the parent's threads and connections
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=run_worker, name=f"worker-{number}", daemon=True)
+        for number in range(1, count + 1)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
+
+def stop_workers(workers):
+    """Ask worker processes to requeue their jobs and exit"""
+    for worker in workers:
+        worker.terminate()
+    for worker in workers:
+        worker.join(timeout=30)
+
+def main():
+    """Main function to start the bot"""
+    args = parse_args()
+    setup_logging()
+
+    if args.role == "worker":
+        run_worker()
+        return
+
     # Start the bot
-    bot = TelegramBot()
+    bot = TelegramBot(args.role)
+    workers = start_workers(args.workers) if args.role == "front" else []
     logging.info("Bot started. Press Ctrl+C to stop.")
-    bot.run()
+    try:
+        bot.run(args.mode)
+    finally:
+        stop_workers(workers)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()